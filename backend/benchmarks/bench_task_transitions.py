@@ -0,0 +1,60 @@
+"""
+Microbenchmark of the Task state transitions on a task with many dependents.
+
+Run with: python -m benchmarks.bench_task_transitions [n_dependents]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, List
+
+from whatdo2.domain.task.core import Task, TaskType
+
+REPEATS = 200
+
+
+def _new_task(importance: int) -> Task:
+    return Task.new(
+        name="benchmark",
+        importance=importance,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.now() - timedelta(days=1),
+        is_active=True,
+    )
+
+
+def _measure(name: str, fn: Callable[[], Any]) -> None:
+    fn()  # warm up
+
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    per_call = (time.perf_counter() - started) / REPEATS
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<24} {per_call * 1e6:>10.1f} us {peak / 1024:>10.1f} KiB peak")
+
+
+def main(argv: List[str]) -> None:
+    n_dependents = int(argv[1]) if len(argv) > 1 else 300
+    dependents = [_new_task(importance=1 + i % 10) for i in range(n_dependents)]
+    task = _new_task(importance=5).add_dependent_tasks(dependents)
+    extra = _new_task(importance=7)
+    now = datetime.now()
+
+    print(f"Task with {n_dependents} dependents, {REPEATS} repeats")
+    _measure("ensure_valid_state", task.ensure_valid_state)
+    _measure("update_is_active", lambda: task.update_is_active(now))
+    _measure("add_dependent_tasks", lambda: task.add_dependent_tasks([extra]))
+    _measure("to_raw", task.to_raw)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,29 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Iterator, List, TypeVar
+
+import pytest
+
+T = TypeVar("T")
+
+# 100000 is supported too, but takes minutes to set up, so it is opt-in:
+#   BENCHMARK_SIZES=1000,10000,100000 make benchmark
+SIZES: List[int] = [
+    int(size) for size in os.getenv("BENCHMARK_SIZES", "1000,10000").split(",")
+]
+
+
+def pytest_generate_tests(metafunc: Any) -> None:
+    if "size" in metafunc.fixturenames:
+        metafunc.parametrize("size", SIZES, scope="module")
+
+
+@pytest.fixture(scope="module")
+def run() -> Iterator[Callable[[Awaitable[T]], T]]:
+    """
+    Run a coroutine to completion on an event loop shared by the module, as
+    the benchmark fixture only times synchronous callables
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
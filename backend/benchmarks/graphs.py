@@ -0,0 +1,72 @@
+"""
+Synthetic task graphs for the benchmarks.
+
+Every generator returns its tasks children-first, each one already built with
+add_dependent_tasks, so they can be saved in order and are in a valid state.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from whatdo2.domain.task.core import Task, TaskType
+
+PAST = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+FUTURE = datetime.utcnow().replace(microsecond=0) + timedelta(days=365)
+
+
+def new_task(
+    rng: random.Random,
+    is_active: bool = True,
+    activation_time: Optional[datetime] = None,
+) -> Task:
+    if activation_time is None:
+        activation_time = PAST if is_active else FUTURE
+    return Task.new(
+        name="benchmark",
+        importance=rng.randint(1, 10),
+        time=rng.randint(1, 10),
+        task_type=rng.choice(list(TaskType)),
+        activation_time=activation_time,
+        is_active=is_active,
+    )
+
+
+def chain(n: int, seed: int = 0, inactive_leaf: bool = False) -> List[Task]:
+    """
+    n tasks, each a prerequisite of the next: t[n-1] -> ... -> t[1] -> t[0]
+    """
+    rng = random.Random(seed)
+    tasks = [new_task(rng, is_active=not inactive_leaf)]
+    for _ in range(n - 1):
+        tasks.append(new_task(rng).add_dependent_tasks([tasks[-1]]))
+    return tasks
+
+
+def fan_out(n: int, seed: int = 0) -> List[Task]:
+    """
+    One root task that is a prerequisite of n - 1 others
+    """
+    rng = random.Random(seed)
+    dependents = [new_task(rng) for _ in range(n - 1)]
+    return [*dependents, new_task(rng).add_dependent_tasks(dependents)]
+
+
+def random_dag(
+    n: int,
+    max_dependents: int = 3,
+    inactive_ratio: float = 0.2,
+    seed: int = 0,
+) -> List[Task]:
+    """
+    n tasks where each task is a prerequisite of up to max_dependents tasks
+    created before it, so there can be no cycles
+    """
+    rng = random.Random(seed)
+    tasks: List[Task] = []
+    for _ in range(n):
+        task = new_task(rng, is_active=rng.random() >= inactive_ratio)
+        if tasks:
+            dependents = rng.sample(tasks, min(len(tasks), max_dependents))
+            task = task.add_dependent_tasks(dependents)
+        tasks.append(task)
+    return tasks
@@ -0,0 +1,74 @@
+import random
+from datetime import datetime
+from typing import Any, List
+
+import pytest
+
+from benchmarks.graphs import chain, fan_out, new_task, random_dag
+from whatdo2.domain.task.core import Task
+from whatdo2.domain.task.graph import CompactGraph, TaskGraph, compute_compact
+
+
+def _cascade(tasks: List[Task]) -> Task:
+    """
+    Recompute a chain children-first, one task at a time, refreshing each
+    task's snapshot of the one below it: the object-at-a-time equivalent of
+    an activation cascading up the chain
+    """
+    child = tasks[0].update_is_active(datetime.utcnow())
+    for parent in tasks[1:]:
+        child = parent.remove_dependent_tasks([child]).add_dependent_tasks([child])
+    return child
+
+
+def test_ensure_valid_state_fan_out(benchmark: Any, size: int) -> None:
+    root = fan_out(size)[-1]
+    benchmark(root.ensure_valid_state)
+
+
+def test_add_dependent_tasks_fan_out(benchmark: Any, size: int) -> None:
+    root = fan_out(size)[-1]
+    extra = new_task(random.Random(1))
+    benchmark(root.add_dependent_tasks, [extra])
+
+
+def test_update_is_active_cascade_chain(benchmark: Any, size: int) -> None:
+    tasks = chain(size, inactive_leaf=True)
+    benchmark(_cascade, tasks)
+
+
+def test_graph_compute_random_dag(benchmark: Any, size: int) -> None:
+    tasks = random_dag(size)
+    benchmark(TaskGraph.from_tasks, tasks)
+
+
+def test_compact_graph_random_dag(benchmark: Any, size: int) -> None:
+    """
+    The part of an offloaded computation that stays on the event loop
+    """
+    tasks = random_dag(size)
+    benchmark(CompactGraph.from_tasks, tasks)
+
+
+def test_compute_compact_random_dag(benchmark: Any, size: int) -> None:
+    compact = CompactGraph.from_tasks(random_dag(size))
+    benchmark(compute_compact, compact)
+
+
+def test_compute_vectorized_random_dag(benchmark: Any, size: int) -> None:
+    pytest.importorskip("numpy")
+    from whatdo2.domain.task.vectorized import compute_vectorized
+
+    compact = CompactGraph.from_tasks(random_dag(size))
+    benchmark(compute_vectorized, compact)
+
+
+def test_graph_activation_random_dag(benchmark: Any, size: int) -> None:
+    tasks = random_dag(size)
+    graph = TaskGraph.from_tasks(tasks)
+    leaf = tasks[0]
+
+    def _toggle() -> None:
+        graph.set_is_active(leaf.id, not graph.is_active(leaf.id))
+
+    benchmark(_toggle)
@@ -0,0 +1,188 @@
+"""
+Repository and query benchmarks. They run against an in-memory store, and
+against the Postgres configured in whatdo2.config, which are skipped when it
+cannot be reached.
+"""
+import json
+import random
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+    TypeVar,
+)
+
+import pytest
+
+from benchmarks.graphs import PAST, new_task, random_dag
+from whatdo2.adapters.database import dispose_engine, get_engine
+from whatdo2.adapters.in_memory_task_repository import InMemoryTaskStore
+from whatdo2.adapters.orm import delete_and_create_tables
+from whatdo2.domain.task.core import Task
+from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.graph_executor import GraphExecutor
+from whatdo2.service_layer.task_import_service import ImportReport, TaskImportService
+from whatdo2.service_layer.task_query_service import TaskQueryService
+from whatdo2.service_layer.unit_of_work import UnitOfWork, new_in_memory_uow, new_uow
+
+T = TypeVar("T")
+Runner = Callable[[Awaitable[T]], T]
+UowFactory = Callable[[], AsyncContextManager[UnitOfWork]]
+
+
+async def _ping() -> None:
+    async with get_engine().connect():
+        pass
+
+
+async def _save_many(uow_factory: UowFactory, tasks: List[Task]) -> None:
+    async with uow_factory() as uow:
+        await uow.task_repository.save_many(tasks)
+
+
+@pytest.fixture(name="tasks", scope="module")
+def tasks_fixture(size: int) -> List[Task]:
+    rng = random.Random(1)
+    tasks = random_dag(size)
+    # Some inactive tasks that are due, for the activation queries
+    tasks += [
+        new_task(rng, is_active=False, activation_time=PAST) for _ in range(size // 10)
+    ]
+    return tasks
+
+
+@pytest.fixture(name="sql_uow_factory", scope="module")
+def sql_uow_factory_fixture(
+    run: Runner[Any], tasks: List[Task]
+) -> Iterator[UowFactory]:
+    try:
+        run(_ping())
+    except Exception:
+        pytest.skip("Postgres is not available")
+
+    def uow_factory() -> AsyncContextManager[UnitOfWork]:
+        return new_uow(EventBus())
+
+    run(delete_and_create_tables())
+    run(_save_many(uow_factory, tasks))
+    yield uow_factory
+    run(dispose_engine())
+
+
+@pytest.fixture(name="in_memory_uow_factory", scope="module")
+def in_memory_uow_factory_fixture(run: Runner[Any], tasks: List[Task]) -> UowFactory:
+    store = InMemoryTaskStore()
+
+    def uow_factory() -> AsyncContextManager[UnitOfWork]:
+        return new_in_memory_uow(EventBus(), store)
+
+    run(_save_many(uow_factory, tasks))
+    return uow_factory
+
+
+@pytest.fixture(
+    name="uow_factory",
+    params=[pytest.param("sql", marks=pytest.mark.db_unit_test), "in_memory"],
+)
+def uow_factory_fixture(request: Any) -> UowFactory:
+    uow_factory: UowFactory = request.getfixturevalue(f"{request.param}_uow_factory")
+    return uow_factory
+
+
+def test_save(
+    benchmark: Any, run: Runner[None], uow_factory: UowFactory, tasks: List[Task]
+) -> None:
+    async def _save() -> None:
+        async with uow_factory() as uow:
+            await uow.task_repository.save(tasks[-1])
+
+    benchmark(lambda: run(_save()))
+
+
+def test_get(
+    benchmark: Any, run: Runner[Task], uow_factory: UowFactory, tasks: List[Task]
+) -> None:
+    async def _get() -> Task:
+        async with uow_factory() as uow:
+            return await uow.task_repository.get(tasks[-1].id)
+
+    benchmark(lambda: run(_get()))
+
+
+def test_list_inactive_with_past_activation_times(
+    benchmark: Any, run: Runner[List[Task]], uow_factory: UowFactory, tasks: List[Task]
+) -> None:
+    async def _list() -> List[Task]:
+        async with uow_factory() as uow:
+            return await uow.task_repository.list_inactive_with_past_activation_times()
+
+    benchmark(lambda: run(_list()))
+
+
+@pytest.mark.db_unit_test
+@pytest.mark.parametrize("limit", [100, 1000])
+def test_query_service_list_tasks(
+    benchmark: Any, run: Runner[Any], sql_uow_factory: UowFactory, limit: int
+) -> None:
+    query_service = TaskQueryService()
+    benchmark(lambda: run(query_service.list_tasks(limit=limit)))
+
+
+def _import_lines(tasks: List[Task]) -> List[bytes]:
+    lines = [
+        json.dumps(
+            {
+                "kind": "task",
+                "id": str(t.id),
+                "name": t.name,
+                "importance": t.importance,
+                "task_type": t.task_type.value,
+                "time": t.time,
+                "activation_time": t.activation_time.isoformat(),
+            }
+        ).encode()
+        for t in tasks
+    ]
+    lines += [
+        json.dumps(
+            {"kind": "edge", "parent_id": str(t.id), "child_id": str(d.id)}
+        ).encode()
+        for t in tasks
+        for d in t.is_prerequisite_for
+    ]
+    return lines
+
+
+def test_import_tasks(benchmark: Any, run: Runner[ImportReport], size: int) -> None:
+    """
+    A whole in-memory import of a fresh random DAG per round, from parsing its
+    lines to committing it
+    """
+    lines = _import_lines(random_dag(size))
+
+    async def _lines() -> AsyncIterator[bytes]:
+        for line in lines:
+            yield line
+
+    # Shared, so that no round pays for starting a pool
+    graph_executor = GraphExecutor(kind="inline")
+
+    def _setup() -> Tuple[Tuple[TaskImportService], Dict[str, Any]]:
+        store = InMemoryTaskStore()
+        import_service = TaskImportService(
+            uow_factory=lambda: new_in_memory_uow(EventBus(), store),
+            graph_executor=graph_executor,
+        )
+        return (import_service,), {}
+
+    benchmark.pedantic(
+        lambda import_service: run(import_service.import_tasks(_lines())),
+        setup=_setup,
+        rounds=5,
+    )
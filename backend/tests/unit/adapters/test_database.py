@@ -0,0 +1,29 @@
+import pytest
+
+from whatdo2.adapters.database import dispose_engine, get_engine, pool_stats
+from whatdo2.config import DB_POOL_SIZE
+
+
+@pytest.mark.asyncio
+async def test_engine_is_shared_until_disposed() -> None:
+    """
+    Given that I have requested the engine
+    When I request it again, and then again after disposing it
+    Then I should get the same engine back until it has been disposed
+    """
+    engine = get_engine()
+    assert get_engine() is engine
+
+    await dispose_engine()
+
+    assert get_engine() is not engine
+    await dispose_engine()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_reflect_configured_pool() -> None:
+    stats = pool_stats()
+
+    assert stats.size == DB_POOL_SIZE
+    assert stats.checked_out == 0
+    await dispose_engine()
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from whatdo2.adapters.in_memory_task_repository import (
+    InMemoryTaskRepository,
+    InMemoryTaskStore,
+)
+from whatdo2.adapters.task_repository import ConcurrentUpdateError, TaskNotFoundError
+from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.unit_of_work import new_in_memory_uow
+
+
+def _task(is_active: bool = True) -> Task:
+    now = datetime.utcnow().replace(microsecond=0)
+    return Task.new(
+        name="hello",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now if is_active else now - timedelta(days=1),
+        is_active=is_active,
+    )
+
+
+@pytest.mark.asyncio
+async def test_changes_are_visible_to_later_units_of_work_once_committed() -> None:
+    """
+    Given an in-memory store
+    When I save a task in one unit of work
+    Then it should be visible in the next one
+    """
+    store = InMemoryTaskStore()
+    task = _task()
+
+    async with new_in_memory_uow(EventBus(), store) as uow:
+        await uow.task_repository.save(task)
+        assert store.rows == {}
+
+    async with new_in_memory_uow(EventBus(), store) as uow:
+        assert await uow.task_repository.get(task.id) == task
+
+
+@pytest.mark.asyncio
+async def test_changes_are_rolled_back_on_error() -> None:
+    """
+    Given an in-memory store with an inactive, due task in it
+    When a unit of work activates it and deletes another task, then fails
+    Then neither change should be visible afterwards
+    """
+    store = InMemoryTaskStore()
+    due = _task(is_active=False)
+    other = _task()
+    async with new_in_memory_uow(EventBus(), store) as uow:
+        await uow.task_repository.save_many([due, other])
+
+    with pytest.raises(RuntimeError):
+        async with new_in_memory_uow(EventBus(), store) as uow:
+            await uow.task_repository.activate_due_tasks(datetime.utcnow())
+            await uow.task_repository.delete(other.id)
+            raise RuntimeError()
+
+    async with new_in_memory_uow(EventBus(), store) as uow:
+        assert await uow.task_repository.get_many([due.id, other.id]) == [due, other]
+        assert await uow.task_repository.list_inactive_with_past_activation_times() == [
+            due
+        ]
+
+
+@pytest.mark.asyncio
+async def test_dependent_tasks_must_exist() -> None:
+    store = InMemoryTaskStore()
+    child = _task()
+    parent = _task().add_dependent_tasks([child])
+
+    # Saves are written when the unit of work is flushed, on its way out
+    with pytest.raises(TaskNotFoundError):
+        async with new_in_memory_uow(EventBus(), store) as uow:
+            await uow.task_repository.save(parent)
+    assert store.rows == {}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_conflict() -> None:
+    """
+    Given a task loaded by two repositories over the same store
+    When both of them rename it, and the first one commits
+    Then committing the second one fails, and leaves the first one's change
+    """
+    store = InMemoryTaskStore()
+    task = _task()
+    store.put_row(task.id, task)
+    first, second = InMemoryTaskRepository(store), InMemoryTaskRepository(store)
+
+    await first.save((await first.get(task.id))._replace(name="first"))
+    await second.save((await second.get(task.id))._replace(name="second"))
+    first.commit()
+
+    with pytest.raises(ConcurrentUpdateError):
+        second.commit()
+    assert store.rows[task.id].name == "first"
+    assert store.rows[task.id].version == task.version + 1
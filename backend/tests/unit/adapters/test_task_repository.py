@@ -1,30 +1,48 @@
 import asyncio
 from datetime import datetime, timedelta
-from typing import Any, AsyncGenerator, Callable
-from uuid import UUID
+from typing import Any, AsyncGenerator, Callable, Dict, List
+from uuid import UUID, uuid4
 
 import pytest
 import pytest_asyncio
+from sqlalchemy.dialects.postgresql.base import PGDialect
 
+from whatdo2.adapters.database import dispose_engine, new_session
+from whatdo2.adapters.in_memory_task_repository import (
+    InMemoryTaskRepository,
+    InMemoryTaskStore,
+)
 from whatdo2.adapters.orm import delete_and_create_tables
-from whatdo2.adapters.task_repository import TaskRepository
+from whatdo2.adapters.sql_task_repository import (
+    SQLTaskRepository,
+    _targets_first,
+    _update_statement,
+)
+from whatdo2.adapters.task_repository import (
+    ConcurrentUpdateError,
+    TaskNotFoundError,
+    TaskRepository,
+)
 from whatdo2.domain.task.core import Task, TaskType
-from whatdo2.service_layer.eventbus import EventBus
-from whatdo2.service_layer.unit_of_work import new_uow
 
-pytestmark = pytest.mark.db_unit_test
 
+@pytest_asyncio.fixture(
+    name="repository",
+    params=[pytest.param("sql", marks=pytest.mark.db_unit_test), "in_memory"],
+)
+async def repository_fixture(request: Any) -> AsyncGenerator[TaskRepository, None]:
+    # The repositories themselves, rather than those of a unit of work, whose
+    # identity map would answer the reads without them
+    if request.param == "in_memory":
+        yield InMemoryTaskRepository(InMemoryTaskStore())
+        return
 
-@pytest_asyncio.fixture(name="create_tables", autouse=True)
-async def create_tables_fixture() -> None:
     await delete_and_create_tables()
-
-
-@pytest_asyncio.fixture(name="repository")
-async def repository_fixture() -> AsyncGenerator[TaskRepository, None]:
-    eventbus = EventBus()
-    async with new_uow(eventbus) as uow:
-        yield uow.task_repository
+    async with new_session() as session:
+        yield SQLTaskRepository(session)
+        await session.commit()
+    # Pooled connections are bound to this test's event loop
+    await dispose_engine()
 
 
 def _delete_task_finalizer(
@@ -164,3 +182,294 @@ async def test_list_prerequisites_for_task(
     result = await repository.list_prerequisites_for_task(child.id)
 
     assert result == [task]
+
+
+@pytest.mark.asyncio
+async def test_activate_due_tasks(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have an inactive task with a past activation time and one
+      with a future activation time
+    When I call activate_due_tasks
+    Then only the first task should be activated and returned
+    """
+    now = datetime.now().replace(microsecond=0)
+
+    due = Task.new(
+        name="DUE",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now - timedelta(days=1),
+        is_active=False,
+    )
+    not_due = Task.new(
+        name="NOT DUE",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now + timedelta(days=1),
+        is_active=False,
+    )
+
+    await repository.save(due)
+    await repository.save(not_due)
+
+    # Add cleanup for task
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, due.id))
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, not_due.id))
+
+    result = await repository.activate_due_tasks(now)
+
+    assert [t.id for t in result] == [due.id]
+    assert result[0].is_active
+    assert not (await repository.get(task_id=not_due.id)).is_active
+
+
+@pytest.mark.asyncio
+async def test_save_many_and_get_many(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have a parent and child task
+    When I persist them together and retrieve them using get_many
+    Then I should get the same domain objects back, in the requested order
+    """
+    now = datetime.now().replace(microsecond=0)
+
+    child = Task.new(
+        name="hello 2",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    )
+    parent = Task.new(
+        name="hello",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    ).add_dependent_tasks([child])
+
+    await repository.save_many([child, parent])
+
+    # Add cleanup for task
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, parent.id))
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, child.id))
+
+    result = await repository.get_many([parent.id, child.id])
+    assert result == [parent, child]
+
+
+@pytest.mark.asyncio
+async def test_list_existing_ids(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have persisted a task
+    When I look up its id along with one that was never saved
+    Then I should only get its id back
+    """
+    task = Task.new(
+        name="hello",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.now().replace(microsecond=0),
+        is_active=True,
+    )
+    await repository.save(task)
+
+    # Add cleanup for task
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, task.id))
+
+    assert await repository.list_existing_ids([uuid4(), task.id]) == [task.id]
+
+
+@pytest.mark.asyncio
+async def test_delete(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have a parent and child task
+    When I delete the child task
+    Then it should be gone, and the parent should no longer depend on it or
+      ultimately block it
+    """
+    now = datetime.now().replace(microsecond=0)
+
+    child = Task.new(
+        name="hello 2",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    )
+    parent = Task.new(
+        name="hello",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    ).add_dependent_tasks([child])
+    assert parent.ultimately_blocks == child.id
+
+    await repository.save_many([child, parent])
+
+    # Add cleanup for task
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, parent.id))
+
+    await repository.delete(task_id=child.id)
+
+    with pytest.raises(TaskNotFoundError):
+        await repository.get(task_id=child.id)
+    result = await repository.get(task_id=parent.id)
+    assert result.is_prerequisite_for == ()
+    assert result.ultimately_blocks is None
+    assert await repository.list_prerequisites_for_task(child.id) == []
+
+
+@pytest.mark.asyncio
+async def test_list_ancestors(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have a chain of three tasks, and an unrelated task
+    When I call list_ancestors on the last task of the chain
+    Then I should get the other two tasks of the chain back, with their
+      dependents
+    """
+    now = datetime.now().replace(microsecond=0)
+
+    child = Task.new(
+        name="child",
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    )
+    parent = Task.new(
+        name="parent",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    ).add_dependent_tasks([child])
+    grandparent = Task.new(
+        name="grandparent",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    ).add_dependent_tasks([parent])
+    unrelated = Task.new(
+        name="unrelated",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now,
+        is_active=True,
+    )
+
+    await repository.save_many([child, parent, grandparent, unrelated])
+
+    # Add cleanup for task
+    for task in (grandparent, parent, child, unrelated):
+        request.addfinalizer(_delete_task_finalizer(event_loop, repository, task.id))
+
+    result = await repository.list_ancestors([child.id])
+
+    assert sorted(result, key=lambda t: t.name) == [grandparent, parent]
+
+
+@pytest.mark.asyncio
+async def test_save_only_writes_changed_fields(
+    event_loop: asyncio.BaseEventLoop,
+    repository: TaskRepository,
+    request: Any,
+) -> None:
+    """
+    Given that I have loaded a task
+    When I deactivate it and save it, and then save a rename of the copy I
+      loaded at first
+    Then the task should be inactive at the next version, and the stale
+      rename should be rejected
+    """
+    now = datetime.now().replace(microsecond=0)
+
+    task = Task.new(
+        name="hello",
+        importance=5,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=now + timedelta(days=1),
+        is_active=True,
+    )
+    await repository.save(task)
+
+    # Add cleanup for task
+    request.addfinalizer(_delete_task_finalizer(event_loop, repository, task.id))
+
+    loaded = await repository.get(task_id=task.id)
+    await repository.save(loaded.update_is_active(now))
+
+    result = await repository.get(task_id=task.id)
+    assert result.name == "hello"
+    assert not result.is_active
+    assert result.effective_density == 0.0
+    assert result.version == loaded.version + 1
+
+    with pytest.raises(ConcurrentUpdateError):
+        await repository.save(loaded._replace(name="renamed"))
+
+
+def test_update_statement_bumps_the_version() -> None:
+    """
+    Given the columns changed on loaded tasks
+    When the UPDATE writing them back is compiled for Postgres
+    Then it should set those columns and bump the version, for the task at
+      the version it was loaded at
+    """
+    sql = str(_update_statement(("is_active", "name")).compile(dialect=PGDialect()))
+
+    assert sql == (
+        "UPDATE task SET name=%(b_name)s, is_active=%(b_is_active)s, "
+        "version=(task.version + %(version_1)s) "
+        "WHERE task.id = %(b_id)s AND task.version = %(b_version)s"
+    )
+
+
+def test_new_rows_are_inserted_after_the_tasks_they_ultimately_block() -> None:
+    """
+    Given new rows listed before the new tasks they ultimately block
+    When they are ordered for inserting
+    Then every task should come before the rows that point to it
+    """
+    rows: List[Dict[str, Any]] = [
+        {"id": "a", "ultimately_blocks": "b"},
+        {"id": "b", "ultimately_blocks": "c"},
+        {"id": "d", "ultimately_blocks": "existing"},
+        {"id": "c", "ultimately_blocks": None},
+        {"id": "e", "ultimately_blocks": "c"},
+    ]
+
+    assert [row["id"] for row in _targets_first(rows)] == ["c", "b", "a", "d", "e"]
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from whatdo2.domain.task.core import Task, TaskCircularDependencyError, TaskType
+from whatdo2.domain.task.graph import CompactGraph, TaskGraph, compute_compact
+
+
+def _task(importance: int, is_active: bool = True) -> Task:
+    return Task.new(
+        name="hello",
+        importance=importance,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.now()
+        if is_active
+        else datetime.now() + timedelta(days=1),
+        is_active=is_active,
+    )
+
+
+class TestCompute:
+    def test_effective_density_propagates_along_a_chain(self) -> None:
+        """
+        Given a chain of tasks, the last of which is the densest
+        When we build a graph from them
+        Then every task in the chain should take on the density of the last,
+          plus a margin per level, and ultimately block it
+        """
+        leaf = _task(importance=9)
+        middle = _task(importance=4).add_dependent_tasks([leaf])
+        root = _task(importance=2).add_dependent_tasks([middle])
+
+        graph = TaskGraph.from_tasks([root, middle, leaf])
+
+        assert graph.effective_density(leaf.id) == pytest.approx(1.8)
+        assert graph.effective_density(middle.id) == pytest.approx(1.9)
+        assert graph.effective_density(root.id) == pytest.approx(2.0)
+        assert graph.ultimately_blocks(root.id) == leaf.id
+
+    def test_graph_agrees_with_task(self) -> None:
+        """
+        Given a task with several dependents
+        When we build a graph from the tasks and apply it to the task
+        Then the task should be unchanged
+        """
+        dependents = [_task(importance=i) for i in (3, 8, 8, 1)]
+        dependents.append(_task(importance=10, is_active=False))
+        task = _task(importance=5).add_dependent_tasks(dependents)
+
+        graph = TaskGraph.from_tasks([task, *dependents])
+
+        assert graph.apply(task) == task
+
+    def test_dependents_outside_of_the_graph_are_taken_as_given(self) -> None:
+        leaf = _task(importance=9)
+        middle = _task(importance=4).add_dependent_tasks([leaf])
+        root = _task(importance=2).add_dependent_tasks([middle])
+
+        graph = TaskGraph.from_tasks([root])
+
+        assert graph.effective_density(root.id) == root.effective_density
+        assert graph.ultimately_blocks(root.id) == leaf.id
+
+
+class TestCompactGraph:
+    def test_compact_graph_computes_the_same_values(self) -> None:
+        """
+        Given a chain of tasks, and a task with a dependent outside of them
+        When we compute them from their compact form
+        Then every task should get the same values as from the tasks
+        """
+        leaf = _task(importance=9)
+        middle = _task(importance=4).add_dependent_tasks([leaf])
+        root = _task(importance=2).add_dependent_tasks([middle])
+        other = _task(importance=1).add_dependent_tasks([leaf])
+        tasks = [root, middle, leaf, other]
+
+        graph = TaskGraph.from_tasks(tasks)
+        computed = compute_compact(CompactGraph.from_tasks(tasks))
+
+        assert [computed.apply(t) for t in tasks] == [graph.apply(t) for t in tasks]
+        assert computed.ultimately_blocks(other.id) == leaf.id
+
+
+class TestIncrementalUpdates:
+    def test_activation_only_recomputes_affected_ancestors(self) -> None:
+        """
+        Given an inactive leaf task with a chain of prerequisites, and an
+          unrelated task
+        When the leaf is activated
+        Then the leaf and its ancestors should change, and nothing else
+        """
+        leaf = _task(importance=9, is_active=False)
+        middle = _task(importance=4).add_dependent_tasks([leaf])
+        root = _task(importance=2).add_dependent_tasks([middle])
+        unrelated = _task(importance=3)
+        graph = TaskGraph.from_tasks([root, middle, leaf, unrelated])
+        assert graph.effective_density(root.id) == pytest.approx(0.9)
+
+        changed = graph.set_is_active(leaf.id, True)
+
+        assert changed == {leaf.id, middle.id, root.id}
+        assert graph.effective_density(root.id) == pytest.approx(2.0)
+        assert graph.ultimately_blocks(root.id) == leaf.id
+
+    def test_removing_an_edge_restores_own_density(self) -> None:
+        leaf = _task(importance=9)
+        root = _task(importance=2).add_dependent_tasks([leaf])
+        graph = TaskGraph.from_tasks([root, leaf])
+
+        changed = graph.remove_edge(root.id, leaf.id)
+
+        assert changed == {root.id}
+        assert graph.effective_density(root.id) == pytest.approx(0.4)
+        assert graph.ultimately_blocks(root.id) is None
+
+    def test_edge_closing_a_cycle_is_rejected(self) -> None:
+        """
+        Given a chain of tasks
+        When we make the last task a prerequisite of the first
+        Then there should be an error and the graph should be unchanged
+        """
+        leaf = _task(importance=9)
+        middle = _task(importance=4).add_dependent_tasks([leaf])
+        root = _task(importance=2).add_dependent_tasks([middle])
+        graph = TaskGraph.from_tasks([root, middle, leaf])
+
+        with pytest.raises(TaskCircularDependencyError):
+            graph.add_edge(leaf.id, root.id)
+
+        assert graph.ancestors([root.id]) == set()
@@ -1,6 +1,10 @@
+from dataclasses import FrozenInstanceError
 from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID, uuid4
 
 import pytest
+from pydantic import ValidationError
 
 from whatdo2.domain.task.core import (
     DependentTask,
@@ -116,6 +120,41 @@ class TestTaskDependents:
         assert t.ultimately_blocks == dependent_1.id
         assert t.density == 1.0
 
+    def test_task_takes_max_density_regardless_of_dependent_order(self) -> None:
+        """
+        Given a task
+        When we make it a prerequisite of a less dense task and then a denser one
+        Then the task's effective_density should follow the denser dependent
+        """
+        lighter = Task.new(
+            name="hello",
+            importance=6,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        )
+        denser = Task.new(
+            name="hello",
+            importance=9,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        )
+
+        t = Task.new(
+            name="hello",
+            importance=5,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        ).add_dependent_tasks([lighter, denser])
+
+        assert t.effective_density == pytest.approx(1.9)
+        assert t.ultimately_blocks == denser.id
+
     def test_task_takes_max_density_of_effective_density(self) -> None:
         """
         Given two tasks, both with dependent tasks
@@ -331,3 +370,115 @@ class TestUpdateIsActive:
         assert not task.is_active
         assert task.effective_density == 0
         assert task.events == (TaskDeactivated(task.id),)
+
+
+class TestTaskRepresentation:
+    def test_orm_values_are_validated_and_coerced(self) -> None:
+        orm = SimpleNamespace(
+            id=str(uuid4()),
+            name="hello",
+            importance="5",
+            time=5,
+            task_type="WORK",
+            activation_time=datetime.now(),
+            is_active=True,
+            density=1.0,
+            effective_density=1.0,
+            ultimately_blocks=None,
+        )
+
+        task = Task.from_orm(orm)
+
+        assert isinstance(task.id, UUID)
+        assert task.importance == 5
+        assert task.task_type == TaskType.WORK
+
+    def test_invalid_orm_values_are_rejected(self) -> None:
+        with pytest.raises(ValidationError):
+            Task.from_orm(SimpleNamespace(id="not a uuid", name="hello"))
+
+    def test_tasks_are_immutable(self) -> None:
+        task = Task.new(
+            name="hello",
+            importance=5,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        )
+
+        with pytest.raises(FrozenInstanceError):
+            task.name = "goodbye"
+
+    def test_transitions_share_unchanged_dependents(self) -> None:
+        dependent = Task.new(
+            name="hello",
+            importance=8,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        )
+        task = Task.new(
+            name="hello",
+            importance=5,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        ).add_dependent_tasks([dependent])
+
+        updated = task.update_is_active(datetime.now())
+
+        assert updated.is_prerequisite_for is task.is_prerequisite_for
+        assert updated == task
+
+
+class TestChangeTracking:
+    def _loaded_task(self, activation_time: datetime) -> Task:
+        return Task.from_orm(
+            SimpleNamespace(
+                id=uuid4(),
+                name="hello",
+                importance=5,
+                time=5,
+                task_type=TaskType.HOME,
+                activation_time=activation_time,
+                is_active=True,
+                density=1.0,
+                effective_density=1.0,
+                ultimately_blocks=None,
+            )
+        )
+
+    def test_new_tasks_are_not_tracked(self) -> None:
+        task = Task.new(
+            name="hello",
+            importance=5,
+            time=5,
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=True,
+        ).update_is_active(datetime.now())
+
+        assert task.changed_fields is None
+
+    def test_transitions_without_effect_change_nothing(self) -> None:
+        task = self._loaded_task(datetime.now()).update_is_active(datetime.now())
+
+        assert task.changed_fields == frozenset()
+
+    def test_transitions_record_changed_fields(self) -> None:
+        """
+        Given a task loaded from storage
+        When it is deactivated
+        Then only the fields that actually changed should be recorded
+        """
+        task = self._loaded_task(datetime.now() + timedelta(days=1))
+
+        updated = task.update_is_active(datetime.now())
+
+        assert updated.changed_fields == frozenset(
+            {"is_active", "effective_density", "events"}
+        )
+        assert task.changed_fields == frozenset()
@@ -0,0 +1,68 @@
+import random
+from datetime import datetime
+from typing import List
+
+import pytest
+
+from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.domain.task.graph import CompactGraph, TaskGraph
+
+pytest.importorskip("numpy")
+
+from whatdo2.domain.task.vectorized import compute_vectorized  # noqa: E402
+
+
+def _random_tasks(rng: random.Random) -> List[Task]:
+    """
+    Build a random DAG of tasks children-first, so that every task is
+    computed by Task.ensure_valid_state from its final dependents. Small
+    importances and times make for plenty of ties.
+    """
+    tasks: List[Task] = []
+    for _ in range(rng.randint(1, 60)):
+        task = Task.new(
+            name="hello",
+            importance=rng.randint(1, 5),
+            time=rng.randint(1, 5),
+            task_type=TaskType.HOME,
+            activation_time=datetime.now(),
+            is_active=rng.random() < 0.8,
+        )
+        dependents = rng.sample(tasks, rng.randint(0, min(4, len(tasks))))
+        if dependents:
+            task = task.add_dependent_tasks(dependents)
+        tasks.append(task)
+    rng.shuffle(tasks)
+    return tasks
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_vectorized_engine_agrees_with_task(seed: int) -> None:
+    """
+    Given a random graph of tasks
+    When we compute it with the vectorized engine
+    Then every task should get exactly the values that Task computed
+    """
+    tasks = _random_tasks(random.Random(seed))
+
+    computed = compute_vectorized(CompactGraph.from_tasks(tasks))
+
+    assert [computed.apply(t) for t in tasks] == tasks
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_vectorized_engine_agrees_with_graph_on_part_of_a_graph(seed: int) -> None:
+    """
+    Given part of a random graph of tasks, some of whose dependents are left
+      out of it
+    When we compute it with the vectorized engine
+    Then every task should get exactly the values that TaskGraph computed
+    """
+    rng = random.Random(seed)
+    tasks = _random_tasks(rng)
+    part = rng.sample(tasks, len(tasks) // 2)
+
+    computed = compute_vectorized(CompactGraph.from_tasks(part))
+
+    graph = TaskGraph.from_tasks(part)
+    assert [computed.apply(t) for t in part] == [graph.apply(t) for t in part]
@@ -0,0 +1,53 @@
+from typing import List
+
+import pytest
+
+from whatdo2.entrypoints.startup import Startup
+
+
+@pytest.mark.asyncio
+async def test_phases_run_in_order_and_are_timed() -> None:
+    ran: List[str] = []
+
+    async def _first() -> None:
+        ran.append("first")
+
+    async def _second() -> None:
+        ran.append("second")
+
+    startup = Startup([("first", _first), ("second", _second)], retry_delay=0)
+
+    assert not startup.ready
+    await startup.run()
+
+    report = startup.report()
+    assert ran == ["first", "second"]
+    assert report.ready
+    assert list(report.phases) == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_failed_phase_is_retried_before_ready() -> None:
+    """
+    Given a phase that fails the first time it runs
+    When the startup runs
+    Then the phase should be retried, and the later phases should only run
+      after it has succeeded
+    """
+    ran: List[str] = []
+
+    async def _flaky() -> None:
+        ran.append("flaky")
+        if len(ran) == 1:
+            raise ConnectionError()
+
+    async def _last() -> None:
+        ran.append("last")
+
+    startup = Startup([("flaky", _flaky), ("last", _last)], retry_delay=0)
+
+    await startup.run()
+
+    assert ran == ["flaky", "flaky", "last"]
+    assert startup.report().ready
+    assert startup.report().failing_phase is None
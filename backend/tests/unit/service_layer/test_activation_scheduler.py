@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from uuid import UUID, uuid4
+
+import pytest
+
+from whatdo2.service_layer.activation_scheduler import ActivationScheduler
+
+
+class _FakeSweep:
+    def __init__(self, schedule: List[Tuple[UUID, datetime]]) -> None:
+        self.schedule = schedule
+        self.calls: List[datetime] = []
+        self.loaded = asyncio.Event()
+        self._swept = asyncio.Event()
+
+    async def activate(self) -> None:
+        self.calls.append(datetime.utcnow())
+        self._swept.set()
+
+    async def load_schedule(self) -> List[Tuple[UUID, datetime]]:
+        self.loaded.set()
+        return self.schedule
+
+    async def wait_for_calls(self, count: int) -> None:
+        """
+        Wait until the scheduler has swept the given number of times. The
+        timeout only guards against hanging, and is not relied on.
+        """
+
+        async def _wait() -> None:
+            while len(self.calls) < count:
+                self._swept.clear()
+                await self._swept.wait()
+
+        await asyncio.wait_for(_wait(), timeout=10)
+
+
+def _scheduler(sweep: _FakeSweep) -> ActivationScheduler:
+    return ActivationScheduler(
+        activate=sweep.activate,
+        load_schedule=sweep.load_schedule,
+        resync_interval=60,
+        retry_delay=60,
+    )
+
+
+@pytest.mark.asyncio
+async def test_sweeps_when_a_loaded_task_becomes_due() -> None:
+    """
+    Given a task that becomes due shortly after startup
+    When the scheduler runs
+    Then it should sweep once at startup and once more when the task is due
+    """
+    due = datetime.utcnow() + timedelta(milliseconds=50)
+    sweep = _FakeSweep([(uuid4(), due)])
+    scheduler = _scheduler(sweep)
+
+    runner = asyncio.create_task(scheduler.run())
+    await sweep.wait_for_calls(2)
+    runner.cancel()
+
+    assert len(sweep.calls) == 2
+    assert sweep.calls[1] >= due
+    assert scheduler.next_fire_time is None
+    assert scheduler.stats().fired == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduling_an_earlier_task_wakes_the_scheduler() -> None:
+    """
+    Given a scheduler sleeping until a task that is due in an hour
+    When a task that is due almost immediately is scheduled
+    Then the scheduler should wake up and sweep for it
+    """
+    sweep = _FakeSweep([(uuid4(), datetime.utcnow() + timedelta(hours=1))])
+    scheduler = _scheduler(sweep)
+
+    runner = asyncio.create_task(scheduler.run())
+    # The scheduler only yields once it has loaded the schedule and gone to
+    # sleep until the task that is due in an hour
+    await sweep.loaded.wait()
+    assert len(sweep.calls) == 1
+    scheduler.schedule(uuid4(), datetime.utcnow() + timedelta(milliseconds=20))
+    await sweep.wait_for_calls(2)
+    runner.cancel()
+
+    assert len(sweep.calls) == 2
+    assert scheduler.stats().pending == 1
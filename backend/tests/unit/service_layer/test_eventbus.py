@@ -0,0 +1,73 @@
+import asyncio
+from typing import List, Sequence
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.domain.task.events import TaskActivated, TaskDeactivated, TaskEvent
+from whatdo2.service_layer.eventbus import EventBus
+
+
+@pytest.mark.asyncio
+async def test_batch_handler_gets_merged_events_of_its_types_at_once() -> None:
+    """
+    Given a batch handler registered for two event types
+    When events of both types, with duplicates, are dispatched
+    Then the handler should be called once, with each event once
+    """
+    batches: List[List[TaskEvent]] = []
+
+    async def _handle(events: Sequence[TaskEvent]) -> None:
+        batches.append(list(events))
+
+    eventbus = EventBus()
+    eventbus.register_batch((TaskActivated, TaskDeactivated), _handle)
+
+    t1, t2 = uuid4(), uuid4()
+    await eventbus.dispatch(
+        [TaskActivated(t1), TaskDeactivated(t2), TaskActivated(t1)],
+    )
+
+    assert batches == [[TaskActivated(t1), TaskDeactivated(t2)]]
+
+
+@pytest.mark.asyncio
+async def test_per_event_handlers_see_events_in_order() -> None:
+    seen: List[TaskEvent] = []
+
+    async def _handle(event: TaskActivated) -> None:
+        seen.append(event)
+
+    eventbus = EventBus()
+    eventbus.register(TaskActivated, _handle)
+
+    events = [TaskActivated(uuid4()) for _ in range(5)]
+    await eventbus.dispatch(events)
+
+    assert seen == events
+
+
+@pytest.mark.asyncio
+async def test_handlers_run_concurrently_up_to_the_limit() -> None:
+    """
+    Given three independent handlers and a concurrency limit of two
+    When an event is dispatched
+    Then at most two handlers should be running at any one time
+    """
+    running = 0
+    max_running = 0
+
+    async def _handle(events: Sequence[TaskEvent]) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    eventbus = EventBus(max_concurrency=2)
+    for _ in range(3):
+        eventbus.register_batch(TaskActivated, _handle)
+
+    await eventbus.dispatch([TaskActivated(uuid4())])
+
+    assert max_running == 2
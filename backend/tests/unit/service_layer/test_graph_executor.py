@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.domain.task.graph import TaskGraph
+from whatdo2.service_layer.graph_executor import GraphExecutor
+
+
+def _task(importance: int) -> Task:
+    return Task.new(
+        name="hello",
+        importance=importance,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.now(),
+        is_active=True,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["process", "thread", "inline"])
+async def test_executors_agree_with_the_graph(kind: str) -> None:
+    """
+    Given a chain of tasks
+    When an executor computes them, regardless of their number
+    Then every task should get the same values as from a graph built in place
+    """
+    leaf = _task(importance=9)
+    middle = _task(importance=4).add_dependent_tasks([leaf])
+    root = _task(importance=2).add_dependent_tasks([middle])
+    tasks = [root, middle, leaf]
+    executor = GraphExecutor(kind=kind, threshold=0, max_workers=1)
+
+    try:
+        computed = await executor.compute(tasks)
+    finally:
+        executor.shutdown()
+
+    graph = TaskGraph.from_tasks(tasks)
+    assert [computed.apply(t) for t in tasks] == [graph.apply(t) for t in tasks]
+
+
+def test_unknown_executor_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        GraphExecutor(kind="fibers")
@@ -0,0 +1,136 @@
+from datetime import datetime
+from typing import Iterable, List, Sequence
+from uuid import UUID
+
+import pytest
+
+from whatdo2.adapters.in_memory_task_repository import (
+    InMemoryTaskRepository,
+    InMemoryTaskStore,
+)
+from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.service_layer.identity_map import IdentityMapTaskRepository
+
+
+class _CountingRepository(InMemoryTaskRepository):
+    def __init__(self, store: InMemoryTaskStore) -> None:
+        super().__init__(store)
+        self.loaded: List[UUID] = []
+        self.saved: List[List[Task]] = []
+
+    async def get(self, task_id: UUID) -> Task:
+        self.loaded.append(task_id)
+        return await super().get(task_id)
+
+    async def get_many(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ids = list(task_ids)
+        self.loaded.extend(ids)
+        return await super().get_many(ids)
+
+    async def save_many(self, tasks: Sequence[Task]) -> List[Task]:
+        self.saved.append(list(tasks))
+        return await super().save_many(tasks)
+
+
+def _task(name: str = "hello") -> Task:
+    return Task.new(
+        name=name,
+        importance=8,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.utcnow(),
+        is_active=True,
+    )
+
+
+def _committed(*tasks: Task) -> InMemoryTaskStore:
+    store = InMemoryTaskStore()
+    for task in tasks:
+        store.put_row(task.id, task)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_loaded_once_per_unit_of_work() -> None:
+    """
+    Given two stored tasks
+    When I get them repeatedly, one by one and together
+    Then each of them should only be loaded from the repository once
+    """
+    first, second = _task(), _task()
+    inner = _CountingRepository(_committed(first, second))
+    repository = IdentityMapTaskRepository(inner)
+
+    assert await repository.get(first.id) == first
+    assert await repository.get(first.id) is await repository.get(first.id)
+    assert await repository.get_many([first.id, second.id]) == [first, second]
+    assert await repository.get_many([second.id]) == [second]
+
+    assert inner.loaded == [first.id, second.id]
+
+
+@pytest.mark.asyncio
+async def test_saves_are_merged_and_written_once_on_flush() -> None:
+    """
+    Given a stored task, loaded twice within a unit of work
+    When each copy gets a different change and is saved
+    Then nothing is written until the flush, which writes the task once with
+      both changes
+    """
+    task = _task()
+    inner = _CountingRepository(_committed(task))
+    repository = IdentityMapTaskRepository(inner)
+
+    loaded = await repository.get(task.id)
+    await repository.save(loaded._replace(name="renamed"))
+    await repository.save(loaded._replace(importance=2))
+    assert inner.saved == []
+
+    result = await repository.get(task.id)
+    assert (result.name, result.importance) == ("renamed", 2)
+
+    await repository.flush()
+    assert len(inner.saved) == 1
+    [[written]] = inner.saved
+    assert written.changed_fields == frozenset(("name", "importance"))
+    assert await inner.get(task.id) == result._replace(version=1)
+    assert await repository.get(task.id) == result._replace(version=1)
+
+
+@pytest.mark.asyncio
+async def test_queries_see_the_pending_saves() -> None:
+    """
+    Given a task saved, but not flushed yet, as the prerequisite of another
+    When I list the prerequisites of the other task
+    Then the pending task should be flushed first, and listed
+    """
+    dependent = _task("dependent")
+    inner = _CountingRepository(_committed(dependent))
+    repository = IdentityMapTaskRepository(inner)
+
+    task = _task().add_dependent_tasks([dependent])
+    await repository.save(task)
+
+    assert await repository.list_prerequisites_for_task(dependent.id) == [task]
+    assert len(inner.saved) == 1
+
+
+@pytest.mark.asyncio
+async def test_deleted_tasks_are_ranked_as_inactive() -> None:
+    """
+    Given a stored active task
+    When I delete it
+    Then it should be ranked as inactive, to be taken out of the ranks
+    """
+    task = _task()
+    repository = IdentityMapTaskRepository(_CountingRepository(_committed(task)))
+
+    await repository.delete(task.id)
+
+    [ranked] = repository.pop_ranked()
+    assert (ranked.id, ranked.is_active, ranked.effective_density) == (
+        task.id,
+        False,
+        0.0,
+    )
+    assert await repository.get_many([task.id]) == []
@@ -0,0 +1,21 @@
+import json
+from datetime import datetime
+from uuid import uuid4
+
+from whatdo2.service_layer.json_encoding import dumps, stdlib_dumps
+
+
+def test_dumps_matches_stdlib_encoding() -> None:
+    """
+    Given a value with UUIDs and datetimes in it
+    When it is encoded with dumps, and with the standard library
+    Then both encodings hold the same JSON
+    """
+    value = {
+        "id": uuid4(),
+        "activation_time": datetime(2022, 5, 1, 12, 30, 15, 250),
+        "items": [{"id": uuid4()}, 1.5, None, True],
+    }
+
+    assert json.loads(dumps(value)) == json.loads(stdlib_dumps(value))
+    assert json.loads(stdlib_dumps(value))["id"] == str(value["id"])
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Iterable, List, Tuple
+from uuid import UUID, uuid4
+
+import pytest
+
+from whatdo2.domain.task.events import TaskRankChanged
+from whatdo2.service_layer.next_task_index import NextTaskIndex
+
+Rank = Tuple[UUID, str, float]
+
+
+def _index(ranks: List[Rank], max_age: float = 60) -> NextTaskIndex:
+    async def _load() -> Iterable[Rank]:
+        return list(ranks)
+
+    return NextTaskIndex(load=_load, max_age=max_age)
+
+
+@pytest.mark.asyncio
+async def test_top_tasks_are_the_densest_active_ones() -> None:
+    """
+    Given an index loaded with tasks of two types
+    When I ask for the top tasks, of a type or of any type
+    Then I should get the densest ones first
+    """
+    home, work, dense_work = uuid4(), uuid4(), uuid4()
+    index = _index(
+        [(home, "HOME", 2.0), (work, "WORK", 1.0), (dense_work, "WORK", 3.0)]
+    )
+    assert index.top(1) is None
+
+    await index.refresh()
+
+    assert index.top(2, "WORK") == [dense_work, work]
+    assert index.top(2) == [dense_work, home]
+    assert index.top(5, "HOME") == [home]
+    assert index.top(5, "OTHER") == []
+
+
+@pytest.mark.asyncio
+async def test_events_keep_the_index_up_to_date() -> None:
+    """
+    Given a loaded index
+    When tasks are created, reprioritised and deactivated
+    Then the index should follow
+    """
+    first, second = uuid4(), uuid4()
+    index = _index([(first, "HOME", 2.0)])
+    await index.refresh()
+
+    await index.handle_events(
+        [
+            TaskRankChanged(second, "HOME", True, 1.0),
+            TaskRankChanged(first, "HOME", True, 0.5),
+        ]
+    )
+    assert index.top(2) == [second, first]
+
+    await index.handle_events([TaskRankChanged(second, "HOME", False, 0.0)])
+    assert index.top(2) == [first]
+    assert len(index) == 1
+
+
+@pytest.mark.asyncio
+async def test_events_during_a_reload_are_not_lost() -> None:
+    """
+    Given an index being reloaded
+    When an event is handled before the load returns
+    Then the reloaded index should include the event
+    """
+    loaded, created = uuid4(), uuid4()
+    release = asyncio.Event()
+
+    async def _load() -> Iterable[Rank]:
+        await release.wait()
+        return [(loaded, "HOME", 1.0)]
+
+    index = NextTaskIndex(load=_load, max_age=60)
+    refreshing = asyncio.ensure_future(index.refresh())
+    await asyncio.sleep(0)
+    await index.handle_events([TaskRankChanged(created, "HOME", True, 2.0)])
+    release.set()
+    await refreshing
+
+    assert index.top(2) == [created, loaded]
+
+
+@pytest.mark.asyncio
+async def test_a_stale_index_is_not_used() -> None:
+    """
+    Given an index older than its maximum age
+    When I ask for the top tasks
+    Then I should get None, until it is reloaded
+    """
+    task_id = uuid4()
+    index = _index([(task_id, "HOME", 1.0)], max_age=0)
+    await index.refresh()
+    await asyncio.sleep(0.01)
+
+    assert index.top(1) is None
@@ -0,0 +1,202 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncContextManager, AsyncGenerator, List, Sequence
+
+import pytest
+
+from whatdo2.adapters.in_memory_task_repository import InMemoryTaskStore
+from whatdo2.domain.task.core import PRIORITY_DENSITY_MARGIN, Task, TaskType
+from whatdo2.domain.task.events import TaskActivated, TaskRankChanged
+from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.task_command_service import TaskCommandService
+from whatdo2.service_layer.unit_of_work import UnitOfWork, new_in_memory_uow
+
+
+@pytest.fixture(name="store")
+def store_fixture() -> InMemoryTaskStore:
+    return InMemoryTaskStore()
+
+
+@pytest.fixture(name="eventbus")
+def eventbus_fixture() -> EventBus:
+    return EventBus()
+
+
+@pytest.fixture(name="command_service")
+def command_service_fixture(
+    eventbus: EventBus, store: InMemoryTaskStore
+) -> TaskCommandService:
+    def uow_factory() -> AsyncContextManager[UnitOfWork]:
+        return new_in_memory_uow(eventbus, store)
+
+    return TaskCommandService(uow_factory=uow_factory)
+
+
+@pytest.mark.asyncio
+async def test_activating_a_dependent_task_updates_its_prerequisites(
+    command_service: TaskCommandService,
+    eventbus: EventBus,
+    store: InMemoryTaskStore,
+) -> None:
+    """
+    Given a task with an inactive dependent task that has become due
+    When the ready tasks are activated
+    Then the dependent task should be active, the prerequisite should take on
+      its density and a TaskActivated event should be published, marked as
+      having its prerequisites updated
+    """
+    activated = []
+
+    async def _handle(event: TaskActivated) -> None:
+        activated.append((event.task_id, event.prerequisites_updated))
+
+    eventbus.register(TaskActivated, _handle)
+
+    dependent = await command_service.create_task(
+        name="dependent",
+        importance=9,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.utcnow() + timedelta(seconds=1),
+    )
+    task = await command_service.create_task(
+        name="task",
+        importance=2,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.utcnow(),
+    )
+    task = await command_service.add_dependent_task(task.id, dependent.id)
+    assert task.ultimately_blocks is None
+
+    for task_id in store.due(dependent.activation_time):
+        # Bring the activation time forward, rather than wait for it
+        store.put_row(
+            task_id,
+            store.rows[task_id]._replace(activation_time=datetime.utcnow()),
+        )
+    await command_service.activate_ready_tasks()
+
+    # The prerequisites were recomputed by the sweep, not to be updated again
+    assert activated == [(dependent.id, True)]
+    assert store.rows[dependent.id].is_active
+    assert store.rows[task.id].ultimately_blocks == dependent.id
+    assert store.rows[task.id].effective_density == pytest.approx(1.9)
+
+
+@pytest.mark.asyncio
+async def test_commands_are_retried_on_concurrent_updates(
+    eventbus: EventBus, store: InMemoryTaskStore
+) -> None:
+    """
+    Given a due, inactive prerequisite task, whose stored version changes
+      under the first attempt at activating it
+    When the prerequisites of its dependent are updated
+    Then the update should be retried, and succeed on the second attempt
+    """
+    attempts: List[int] = []
+    prerequisite = Task.new(
+        name="prerequisite",
+        importance=2,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.utcnow(),
+        is_active=False,
+    )
+    dependent = Task.new(
+        name="dependent",
+        importance=9,
+        time=5,
+        task_type=TaskType.HOME,
+        activation_time=datetime.utcnow(),
+        is_active=True,
+    )
+    async with new_in_memory_uow(eventbus, store) as uow:
+        await uow.task_repository.save_many(
+            [dependent, prerequisite.add_dependent_tasks([dependent])]
+        )
+
+    @asynccontextmanager
+    async def uow_factory() -> AsyncGenerator[UnitOfWork, None]:
+        attempts.append(len(attempts) + 1)
+        async with new_in_memory_uow(eventbus, store) as uow:
+            yield uow
+            if len(attempts) == 1:
+                row = store.rows[prerequisite.id]
+                store.put_row(prerequisite.id, row._replace(version=row.version + 1))
+
+    command_service = TaskCommandService(uow_factory=uow_factory)
+    await command_service.update_is_active_for_prerequisite_tasks([dependent.id])
+
+    assert attempts == [1, 2]
+    assert store.rows[prerequisite.id].is_active
+    assert store.rows[prerequisite.id].version == 2
+
+
+@pytest.mark.asyncio
+async def test_rank_changes_are_published(
+    command_service: TaskCommandService, eventbus: EventBus
+) -> None:
+    """
+    Given a task, and a denser task that depends on it
+    When the dependency is added
+    Then the new rank of each of them should be published once written
+    """
+    ranks: List[TaskRankChanged] = []
+
+    async def _handle(events: Sequence[TaskRankChanged]) -> None:
+        ranks.extend(events)
+
+    eventbus.register_batch(TaskRankChanged, _handle)
+
+    dependent = await command_service.create_task(
+        name="dependent",
+        importance=9,
+        time=1,
+        task_type=TaskType.WORK,
+        activation_time=datetime.utcnow(),
+    )
+    task = await command_service.create_task(
+        name="task",
+        importance=1,
+        time=1,
+        task_type=TaskType.WORK,
+        activation_time=datetime.utcnow(),
+    )
+    await command_service.add_dependent_task(task.id, dependent.id)
+
+    assert ranks == [
+        TaskRankChanged(dependent.id, "WORK", True, 9.0),
+        TaskRankChanged(task.id, "WORK", True, 1.0),
+        TaskRankChanged(task.id, "WORK", True, 9.0 + PRIORITY_DENSITY_MARGIN),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_adding_a_dependent_recomputes_the_ancestors(
+    command_service: TaskCommandService, store: InMemoryTaskStore
+) -> None:
+    """
+    Given a task that another task depends on
+    When a denser dependent is added to it
+    Then both the task and the one before it should take on its density,
+      within the same command
+    """
+    root, task, dependent = [
+        await command_service.create_task(
+            name=name,
+            importance=importance,
+            time=1,
+            task_type=TaskType.WORK,
+            activation_time=datetime.utcnow(),
+        )
+        for name, importance in (("root", 1), ("task", 2), ("dependent", 9))
+    ]
+    await command_service.add_dependent_task(root.id, task.id)
+
+    task = await command_service.add_dependent_task(task.id, dependent.id)
+
+    assert task.effective_density == 9.0 + PRIORITY_DENSITY_MARGIN
+    assert store.rows[task.id].effective_density == task.effective_density
+    assert store.rows[root.id].effective_density == (9.0 + 2 * PRIORITY_DENSITY_MARGIN)
+    assert store.rows[root.id].ultimately_blocks == dependent.id
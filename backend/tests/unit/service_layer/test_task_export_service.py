@@ -0,0 +1,95 @@
+from collections import namedtuple
+from datetime import datetime
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+import pytest
+
+from whatdo2.adapters.in_memory_task_repository import InMemoryTaskStore
+from whatdo2.domain.task.core import TaskType
+from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.task_export_service import (
+    edge_record,
+    encode_ndjson,
+    task_record,
+)
+from whatdo2.service_layer.task_import_service import TaskImportService
+from whatdo2.service_layer.task_records import TaskRecord, parse_record
+from whatdo2.service_layer.unit_of_work import new_in_memory_uow
+
+TaskRow = namedtuple(
+    "TaskRow",
+    [
+        "id",
+        "name",
+        "importance",
+        "task_type",
+        "time",
+        "activation_time",
+        "is_active",
+        "density",
+        "effective_density",
+    ],
+)
+EdgeRow = namedtuple("EdgeRow", ["parent_id", "child_id"])
+
+
+def _task_row(importance: int) -> TaskRow:
+    return TaskRow(
+        id=str(uuid4()),
+        name="exported",
+        importance=importance,
+        task_type=TaskType.WORK.value,
+        time=4,
+        activation_time=datetime(2022, 5, 1, 12, 30, 15, 250),
+        is_active=True,
+        density=importance / 4,
+        effective_density=importance / 4,
+    )
+
+
+def test_exported_records_are_read_back_by_the_import() -> None:
+    """
+    Given a task row
+    When it is exported as a JSON line
+    Then the import should read it back as the same task
+    """
+    row = _task_row(2)
+
+    [line] = encode_ndjson([row], task_record).splitlines()
+
+    assert parse_record(line) == TaskRecord(
+        id=row.id,
+        name=row.name,
+        importance=row.importance,
+        task_type=row.task_type,
+        time=row.time,
+        activation_time=row.activation_time,
+    )
+
+
+@pytest.mark.asyncio
+async def test_an_export_can_be_imported() -> None:
+    """
+    Given the export of two tasks, one a prerequisite of the other
+    When it is imported
+    Then both tasks and the dependency between them should be stored
+    """
+    prerequisite, dependent = _task_row(1), _task_row(8)
+    exported = encode_ndjson([prerequisite, dependent], task_record) + encode_ndjson(
+        [EdgeRow(prerequisite.id, dependent.id)], edge_record
+    )
+
+    async def _lines() -> AsyncIterator[bytes]:
+        for line in exported.splitlines():
+            yield line
+
+    store = InMemoryTaskStore()
+    import_service = TaskImportService(
+        uow_factory=lambda: new_in_memory_uow(EventBus(), store),
+    )
+    report = await import_service.import_tasks(_lines())
+
+    assert (report.tasks, report.edges) == (2, 1)
+    children = store.children[UUID(prerequisite.id)]
+    assert [str(c) for c in children] == [dependent.id]
@@ -0,0 +1,121 @@
+import json
+from typing import Any, AsyncGenerator, Dict, Tuple
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.domain.task.events import (
+    TaskActivated,
+    TaskCreated,
+    TaskDeactivated,
+    TaskRankChanged,
+)
+from whatdo2.service_layer.task_feed import TaskFeed
+
+
+def _feed(max_pending: int = 100, history: int = 10) -> TaskFeed:
+    return TaskFeed(
+        max_pending=max_pending,
+        history=history,
+        coalesce_delay=0.01,
+        keepalive=60,
+    )
+
+
+async def _next(stream: AsyncGenerator[bytes, None]) -> Tuple[str, str, Any]:
+    fields: Dict[str, str] = {}
+    for line in (await stream.__anext__()).decode().strip().split("\n"):
+        name, _, value = line.partition(": ")
+        fields[name] = value
+    return fields["event"], fields["id"], json.loads(fields["data"])
+
+
+@pytest.mark.asyncio
+async def test_rapid_changes_to_a_task_are_coalesced() -> None:
+    """
+    Given a subscribed client
+    When a task is created, activated and reprioritised before it reads
+    Then it should get a single diff with the latest values
+    """
+    feed = _feed()
+    task_id = uuid4()
+
+    await feed.handle_events([TaskCreated(task_id)])
+    await feed.handle_events([TaskActivated(task_id)])
+    await feed.handle_events([TaskRankChanged(task_id, "HOME", True, 2.5)])
+
+    # Resuming from the start, as the changes are dispatched before it reads
+    stream = feed.stream(f"{feed.epoch}-0")
+    event, event_id, data = await _next(stream)
+    assert (event, event_id) == ("diff", f"{feed.epoch}-3")
+    assert data == [
+        {
+            "id": str(task_id),
+            "created": True,
+            "is_active": True,
+            "task_type": "HOME",
+            "effective_density": 2.5,
+        }
+    ]
+    assert len(feed) == 1
+
+    await stream.aclose()
+    assert len(feed) == 0
+
+
+@pytest.mark.asyncio
+async def test_clients_resume_from_their_last_event_id() -> None:
+    """
+    Given changes dispatched while a client was away
+    When it reconnects with the id of the last message it got
+    Then it should get the changes since, and a reset if they were dropped
+      or the id is of another process
+    """
+    feed = _feed(history=2)
+    first, second, third = uuid4(), uuid4(), uuid4()
+    await feed.handle_events([TaskCreated(first)])
+    await feed.handle_events([TaskActivated(second)])
+
+    stream = feed.stream(f"{feed.epoch}-1")
+    assert await _next(stream) == (
+        "diff",
+        f"{feed.epoch}-2",
+        [{"id": str(second), "is_active": True}],
+    )
+    await stream.aclose()
+
+    await feed.handle_events([TaskDeactivated(third)])
+    other_epoch = _feed().epoch
+    for last_event_id in (
+        f"{feed.epoch}-0",
+        f"{feed.epoch}-7",
+        f"{other_epoch}-3",
+        "3",
+        "garbage",
+    ):
+        stream = feed.stream(last_event_id)
+        assert await _next(stream) == ("reset", f"{feed.epoch}-3", {})
+        await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_clients_falling_behind_are_reset() -> None:
+    """
+    Given a client that does not keep up
+    When more tasks change than it may have pending
+    Then it should be sent a reset instead, and the changes after it
+    """
+    feed = _feed(max_pending=2)
+
+    await feed.handle_events([TaskCreated(uuid4()) for _ in range(3)])
+    stream = feed.stream(f"{feed.epoch}-0")
+    assert await _next(stream) == ("reset", f"{feed.epoch}-1", {})
+
+    task_id = uuid4()
+    await feed.handle_events([TaskCreated(task_id)])
+    assert await _next(stream) == (
+        "diff",
+        f"{feed.epoch}-2",
+        [{"id": str(task_id), "created": True}],
+    )
+    await stream.aclose()
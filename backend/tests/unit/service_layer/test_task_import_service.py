@@ -0,0 +1,186 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, List
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.adapters.in_memory_task_repository import InMemoryTaskStore
+from whatdo2.domain.task.core import PRIORITY_DENSITY_MARGIN, TaskType
+from whatdo2.domain.task.events import TaskActivationScheduled, TaskCreated
+from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.task_import_service import (
+    InvalidImportError,
+    TaskImportService,
+)
+from whatdo2.service_layer.unit_of_work import UnitOfWork, new_in_memory_uow
+
+
+@pytest.fixture(name="store")
+def store_fixture() -> InMemoryTaskStore:
+    return InMemoryTaskStore()
+
+
+@pytest.fixture(name="eventbus")
+def eventbus_fixture() -> EventBus:
+    return EventBus()
+
+
+@pytest.fixture(name="import_service")
+def import_service_fixture(
+    eventbus: EventBus, store: InMemoryTaskStore
+) -> TaskImportService:
+    def uow_factory() -> AsyncContextManager[UnitOfWork]:
+        return new_in_memory_uow(eventbus, store)
+
+    return TaskImportService(uow_factory=uow_factory)
+
+
+def _task_record(importance: int, activation_time: datetime) -> Dict[str, Any]:
+    return {
+        "kind": "task",
+        "id": str(uuid4()),
+        "name": "imported",
+        "importance": importance,
+        "task_type": TaskType.WORK.value,
+        "time": 2,
+        "activation_time": activation_time.isoformat(),
+    }
+
+
+def _edge_record(parent: Dict[str, Any], child: Dict[str, Any]) -> Dict[str, Any]:
+    return {"kind": "edge", "parent_id": parent["id"], "child_id": child["id"]}
+
+
+async def _lines(records: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    for record in records:
+        yield json.dumps(record).encode()
+
+
+@pytest.mark.asyncio
+async def test_import_computes_densities_and_writes_everything(
+    import_service: TaskImportService,
+    eventbus: EventBus,
+    store: InMemoryTaskStore,
+) -> None:
+    """
+    Given a chain of two prerequisites leading to a denser task, and a task
+      that is not due yet
+    When they are imported
+    Then every task should be stored with its computed values, and the
+      imported tasks should be announced
+    """
+    events: List[Any] = []
+
+    async def _handle(batch: Any) -> None:
+        events.extend(batch)
+
+    eventbus.register_batch((TaskCreated, TaskActivationScheduled), _handle)
+
+    now = datetime.utcnow()
+    first, second, dense = (_task_record(i, now) for i in (2, 4, 20))
+    later = _task_record(3, now + timedelta(days=1))
+    report = await import_service.import_tasks(
+        _lines(
+            [
+                first,
+                second,
+                dense,
+                later,
+                _edge_record(first, second),
+                _edge_record(second, dense),
+            ]
+        )
+    )
+
+    assert (report.tasks, report.edges) == (4, 2)
+    assert report.rows_per_second > 0
+
+    rows = {str(task_id): row for task_id, row in store.rows.items()}
+    assert rows[dense["id"]].effective_density == 10.0
+    assert rows[second["id"]].effective_density == 10.0 + PRIORITY_DENSITY_MARGIN
+    assert rows[first["id"]].effective_density == (10.0 + 2 * PRIORITY_DENSITY_MARGIN)
+    assert str(rows[first["id"]].ultimately_blocks) == dense["id"]
+    assert not rows[later["id"]].is_active
+    assert [str(c) for c in store.children[rows[first["id"]].id]] == [second["id"]]
+
+    assert len([e for e in events if isinstance(e, TaskCreated)]) == 4
+    assert [
+        str(e.task_id) for e in events if isinstance(e, TaskActivationScheduled)
+    ] == [later["id"]]
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_cycles(
+    import_service: TaskImportService, store: InMemoryTaskStore
+) -> None:
+    """
+    Given two tasks that are each other's prerequisites
+    When they are imported
+    Then the import should be rejected, and nothing written
+    """
+    now = datetime.utcnow()
+    first, second = _task_record(1, now), _task_record(2, now)
+
+    with pytest.raises(InvalidImportError, match="circular"):
+        await import_service.import_tasks(
+            _lines(
+                [
+                    first,
+                    second,
+                    _edge_record(first, second),
+                    _edge_record(second, first),
+                ]
+            )
+        )
+    assert store.rows == {}
+
+
+@pytest.mark.parametrize(
+    "bad_record, message",
+    [
+        ({"kind": "task", "name": "no id"}, "Line 2"),
+        ({"kind": "comment"}, "Line 2: Unknown kind"),
+        (
+            {"kind": "edge", "parent_id": str(uuid4()), "child_id": str(uuid4())},
+            "not imported",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_import_rejects_invalid_records(
+    import_service: TaskImportService,
+    store: InMemoryTaskStore,
+    bad_record: Dict[str, Any],
+    message: str,
+) -> None:
+    """
+    Given a batch with an invalid record in it
+    When it is imported
+    Then the import should be rejected with the reason, and nothing written
+    """
+    with pytest.raises(InvalidImportError, match=message):
+        await import_service.import_tasks(
+            _lines([_task_record(1, datetime.utcnow()), bad_record])
+        )
+    assert store.rows == {}
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_existing_tasks(
+    import_service: TaskImportService, store: InMemoryTaskStore
+) -> None:
+    """
+    Given a task that was imported already
+    When a batch with the same id is imported
+    Then the import should be rejected, and the stored task left as it was
+    """
+    now = datetime.utcnow()
+    existing = _task_record(1, now)
+    await import_service.import_tasks(_lines([existing]))
+    stored = dict(store.rows)
+
+    clobbering = dict(existing, name="clobbered", task_type=TaskType.HOME.value)
+    with pytest.raises(InvalidImportError, match=existing["id"]):
+        await import_service.import_tasks(_lines([_task_record(2, now), clobbering]))
+    assert store.rows == stored
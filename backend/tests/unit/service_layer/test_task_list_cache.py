@@ -0,0 +1,68 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.domain.task.events import TaskCreated
+from whatdo2.service_layer.task_list_cache import TaskListCache
+
+
+class _Loader:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.calls = 0
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.body
+
+
+@pytest.mark.asyncio
+async def test_responses_are_cached_until_an_event_arrives() -> None:
+    """
+    Given a cached response
+    When a domain event is handled
+    Then the next request should load the response again
+    """
+    cache = TaskListCache(max_entries=8, ttl=60)
+    load = _Loader(b'{"tasks": []}')
+
+    first = await cache.get_or_load("key", load)
+    second = await cache.get_or_load("key", load)
+    assert load.calls == 1
+    assert second == first
+
+    await cache.handle_events([TaskCreated(uuid4())])
+    third = await cache.get_or_load("key", load)
+
+    assert load.calls == 2
+    assert third.version == first.version + 1
+    # Same content, so the same ETag
+    assert third.etag == first.etag
+
+
+@pytest.mark.asyncio
+async def test_response_loaded_during_invalidation_is_not_cached() -> None:
+    cache = TaskListCache(max_entries=8, ttl=60)
+    load = _Loader(b"stale")
+
+    pending = asyncio.ensure_future(cache.get_or_load("key", load))
+    await asyncio.sleep(0)
+    cache.invalidate()
+    await pending
+
+    assert cache.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted() -> None:
+    cache = TaskListCache(max_entries=2, ttl=60)
+
+    await cache.get_or_load("a", _Loader(b"a"))
+    await cache.get_or_load("b", _Loader(b"b"))
+    cache.get("a")
+    await cache.get_or_load("c", _Loader(b"c"))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.domain.task.core import TaskType
+from whatdo2.service_layer.json_encoding import dumps
+from whatdo2.service_layer.task_query_service import (
+    DependentTaskDTO,
+    InvalidCursorError,
+    TaskDTO,
+    _task_dto,
+    _task_json,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_cursor_round_trips_exactly() -> None:
+    task_id = uuid4()
+    effective_density = 0.1 + 0.2
+
+    assert decode_cursor(encode_cursor(effective_density, task_id)) == (
+        effective_density,
+        task_id,
+    )
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not a cursor",
+        "WzEuMF0=",
+        # [1, 2] and [1, {}]
+        "WzEsIDJd",
+        "WzEsIHt9XQ==",
+    ],
+)
+def test_invalid_cursor_is_rejected(cursor: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_task_row_encodes_like_task_dto() -> None:
+    """
+    Given a row of task columns and the ids of its dependents
+    When it is encoded straight to JSON
+    Then the result matches the encoding of the equivalent TaskDTO
+    """
+    row = SimpleNamespace(
+        id=str(uuid4()),
+        name="Do the dishes",
+        importance=3,
+        task_type=TaskType.HOME.value,
+        time=20,
+        activation_time=datetime(2022, 5, 1, 12, 30, 15, 250),
+        is_active=True,
+        density=0.15,
+        effective_density=0.3,
+    )
+    dependent_ids = [str(uuid4()), str(uuid4())]
+
+    dto = TaskDTO(
+        **vars(row),
+        is_prerequisite_for=[DependentTaskDTO(id=d) for d in dependent_ids],
+    )
+
+    assert json.loads(dumps(_task_json(row, dependent_ids))) == json.loads(dto.json())
+
+
+def test_task_row_builds_the_validated_task_dto() -> None:
+    """
+    Given a row of task columns and the ids of its dependents
+    When a TaskDTO is built from it without validation
+    Then it equals the TaskDTO built with validation
+    """
+    row = SimpleNamespace(
+        id=str(uuid4()),
+        name="Do the dishes",
+        importance=3,
+        task_type=TaskType.HOME.value,
+        time=20,
+        activation_time=datetime(2022, 5, 1, 12, 30, 15, 250),
+        is_active=False,
+        density=0.15,
+        effective_density=0.3,
+    )
+    dependent_ids = [str(uuid4())]
+
+    assert _task_dto(row, dependent_ids) == TaskDTO(
+        **vars(row),
+        is_prerequisite_for=[DependentTaskDTO(id=d) for d in dependent_ids],
+    )
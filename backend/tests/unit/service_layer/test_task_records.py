@@ -0,0 +1,66 @@
+import json
+from typing import AsyncIterator, List
+from uuid import uuid4
+
+import pytest
+
+from whatdo2.service_layer.task_records import (
+    EdgeRecord,
+    InvalidRecordError,
+    iter_lines,
+    parse_record,
+)
+
+
+async def _chunks(chunks: List[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_lines_are_split_across_chunks() -> None:
+    """
+    Given a stream of lines, cut into chunks regardless of line breaks
+    When it is split into lines
+    Then every line should come out whole, including an unterminated last one
+    """
+    chunks = [b'{"a"', b":1}\n{", b'"b":2}\n\n', b'{"c":3}']
+
+    assert [line async for line in iter_lines(_chunks(chunks))] == [
+        b'{"a":1}',
+        b'{"b":2}',
+        b"",
+        b'{"c":3}',
+    ]
+
+
+@pytest.mark.parametrize(
+    "line, message",
+    [
+        (b"{", "Not valid JSON"),
+        (b"[]", "Not a JSON object"),
+        (
+            b'{"kind": "edge", "parent_id": "%s"}' % str(uuid4()).encode(),
+            "Edge without a child_id",
+        ),
+        (
+            b'{"kind": "edge", "parent_id": "1", "child_id": "2"}',
+            "Edge with an invalid id",
+        ),
+        (b'{"kind": "task", "name": "no id"}', "id"),
+    ],
+)
+def test_invalid_records_are_rejected(line: bytes, message: str) -> None:
+    with pytest.raises(InvalidRecordError, match=message):
+        parse_record(line)
+
+
+def test_edge_records_are_parsed() -> None:
+    parent_id, child_id = uuid4(), uuid4()
+    line = json.dumps(
+        {"kind": "edge", "parent_id": str(parent_id), "child_id": str(child_id)}
+    )
+
+    assert parse_record(line.encode()) == EdgeRecord(
+        parent_id=parent_id, child_id=child_id
+    )
@@ -0,0 +1,59 @@
+import pytest
+
+from whatdo2.metrics import COUNT_BUCKETS, Registry
+
+
+@pytest.mark.asyncio
+async def test_histograms_are_exposed_in_the_text_format() -> None:
+    """
+    Given a histogram timing a coroutine function, and a collected gauge
+    When the function is called and the metrics exposed
+    Then the cumulative buckets, sum, count and gauge should be listed
+    """
+    registry = Registry()
+    seconds = registry.histogram("op_seconds", "Time taken", ["op"])
+    sizes = registry.histogram("batch_size", "Batch sizes", buckets=COUNT_BUCKETS)
+    registry.collect("pool", "Connections", lambda: [(("idle",), 3)], ["state"])
+
+    @seconds.timed
+    async def fetch() -> int:
+        return 1
+
+    assert await fetch() == 1
+    sizes.observe(1)
+    sizes.observe(7)
+
+    lines = registry.expose().splitlines()
+
+    assert "# TYPE op_seconds histogram" in lines
+    assert 'op_seconds_bucket{op="fetch",le="10.0"} 1' in lines
+    assert 'op_seconds_count{op="fetch"} 1' in lines
+    assert 'batch_size_bucket{le="0.0"} 0' in lines
+    assert 'batch_size_bucket{le="1.0"} 1' in lines
+    assert 'batch_size_bucket{le="5.0"} 1' in lines
+    assert 'batch_size_bucket{le="10.0"} 2' in lines
+    assert 'batch_size_bucket{le="+Inf"} 2' in lines
+    assert "batch_size_sum 8.0" in lines
+    assert "# TYPE pool gauge" in lines
+    assert 'pool{state="idle"} 3.0' in lines
+
+
+@pytest.mark.asyncio
+async def test_disabled_metrics_cost_nothing() -> None:
+    """
+    Given a disabled registry
+    When functions are timed and values observed
+    Then the functions should be left as they are, and nothing recorded
+    """
+    registry = Registry(enabled=False)
+    seconds = registry.histogram("op_seconds", "Time taken", ["op"])
+
+    async def fetch() -> int:
+        return 1
+
+    assert seconds.timed(fetch) is fetch
+    seconds.observe(1.0, "fetch")
+    with seconds.time("fetch"):
+        pass
+
+    assert "op_seconds_count" not in registry.expose()
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio.engine import AsyncEngine, create_async_engine
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from whatdo2.config import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    POSTGRES_URI,
+)
+
+_ENGINE: Optional[AsyncEngine] = None
+
+
+@dataclass
+class _PoolCounters:
+    connects: int = 0
+    checkouts: int = 0
+    checkout_wait_total: float = 0.0
+    checkout_wait_max: float = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkout_wait_total += seconds
+        self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    connects: int
+    checkouts: int
+    checkout_wait_total: float
+    checkout_wait_max: float
+
+
+_COUNTERS = _PoolCounters()
+
+
+def _register_pool_listeners(engine: AsyncEngine) -> None:
+    pool = engine.sync_engine.pool
+
+    def _on_connect(*_: Any) -> None:
+        _COUNTERS.connects += 1
+
+    def _on_checkout(*_: Any) -> None:
+        _COUNTERS.checkouts += 1
+
+    event.listen(pool, "connect", _on_connect)
+    event.listen(pool, "checkout", _on_checkout)
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Return the process-wide engine, creating it (and its connection pool)
+    on first use
+    """
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = create_async_engine(
+            POSTGRES_URI,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        _register_pool_listeners(_ENGINE)
+    return _ENGINE
+
+
+async def dispose_engine() -> None:
+    """
+    Close every pooled connection and forget the engine. A later call to
+    get_engine will build a fresh one.
+    """
+    global _ENGINE
+    if _ENGINE is not None:
+        await _ENGINE.dispose()
+        _ENGINE = None
+
+
+@asynccontextmanager
+async def new_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Open a session on the shared engine, checking out its connection
+    up front so that the time spent waiting on the pool can be recorded
+    """
+    async with AsyncSession(get_engine(), expire_on_commit=False) as session:
+        started = time.perf_counter()
+        await session.connection()
+        _COUNTERS.record_wait(time.perf_counter() - started)
+        yield session
+
+
+async def warm_up_pool(connections: int) -> None:
+    """
+    Open the given number of pooled connections (up to the pool size) at
+    once, so that requests do not pay for connecting
+    """
+    engine = get_engine()
+    connections = min(connections, DB_POOL_SIZE)
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(connections))
+        )
+
+
+def pool_stats() -> PoolStats:
+    """
+    Return a snapshot of the shared pool's occupancy and checkout counters
+    """
+    pool: Any = get_engine().sync_engine.pool
+    return PoolStats(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        connects=_COUNTERS.connects,
+        checkouts=_COUNTERS.checkouts,
+        checkout_wait_total=_COUNTERS.checkout_wait_total,
+        checkout_wait_max=_COUNTERS.checkout_wait_max,
+    )
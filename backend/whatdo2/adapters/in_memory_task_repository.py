@@ -0,0 +1,318 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from whatdo2.adapters.task_repository import (
+    ConcurrentUpdateError,
+    TaskNotFoundError,
+    TaskRepository,
+)
+from whatdo2.domain.task.core import DependentTask, Task
+
+_InactiveKey = Tuple[datetime, UUID]
+
+# Fields of a task that are not stored in its row
+_NON_COLUMN_FIELDS = frozenset(("is_prerequisite_for", "events"))
+
+
+def _inactive_key(row: Task) -> _InactiveKey:
+    return (row.activation_time.replace(tzinfo=None), row.id)
+
+
+def _version(row: Optional[Task]) -> Optional[int]:
+    return None if row is None else row.version
+
+
+class InMemoryTaskStore:
+    """
+    The committed state of the in-memory backend, shared by the repositories
+    of every unit of work that uses it.
+
+    Tasks are held as rows, without their dependents, in the same shape as
+    the tasks table. The dependency edges are indexed both ways, and the
+    inactive tasks are kept sorted by activation time.
+    """
+
+    def __init__(self) -> None:
+        self.rows: Dict[UUID, Task] = {}
+        # Dependents of each task, in the order they were added
+        self.children: Dict[UUID, Tuple[UUID, ...]] = {}
+        # Prerequisites of each task
+        self.parents: Dict[UUID, FrozenSet[UUID]] = {}
+        self.inactive: List[_InactiveKey] = []
+
+    def put_row(self, task_id: UUID, row: Optional[Task]) -> None:
+        old = self.rows.get(task_id)
+        if old is not None and not old.is_active:
+            key = _inactive_key(old)
+            del self.inactive[bisect_left(self.inactive, key)]
+
+        if row is None:
+            self.rows.pop(task_id, None)
+            self.children.pop(task_id, None)
+            self.parents.pop(task_id, None)
+            return
+
+        self.rows[task_id] = row
+        if not row.is_active:
+            insort(self.inactive, _inactive_key(row))
+
+    def due(self, current_time: datetime) -> List[UUID]:
+        """
+        Ids of the inactive tasks with an activation time at or before the
+        given time, earliest first
+        """
+        cutoff = current_time.replace(tzinfo=None)
+        end = bisect_left(self.inactive, (cutoff,))
+        # Keys at exactly the cutoff sort after (cutoff,), and are due too
+        while end < len(self.inactive) and self.inactive[end][0] <= cutoff:
+            end += 1
+        return [task_id for _, task_id in self.inactive[:end]]
+
+
+class InMemoryTaskRepository(TaskRepository):
+    """
+    A TaskRepository over an InMemoryTaskStore.
+
+    Writes go to a copy-on-write overlay of the committed state, which is
+    applied to the store by commit and dropped by rollback, so a unit of work
+    only ever publishes all or none of its changes. Like the SQL repository,
+    it never commits on its own.
+
+    Committing fails with ConcurrentUpdateError, and rolls back, if any of
+    the rows written was changed by another unit of work in the meantime.
+    """
+
+    def __init__(self, store: InMemoryTaskStore) -> None:
+        self._store = store
+        # None marks a deleted task
+        self._rows: Dict[UUID, Optional[Task]] = {}
+        self._children: Dict[UUID, Tuple[UUID, ...]] = {}
+        self._parents: Dict[UUID, FrozenSet[UUID]] = {}
+        # The committed versions of the rows written, when first written
+        self._base_versions: Dict[UUID, Optional[int]] = {}
+
+    def commit(self) -> None:
+        conflicts = [
+            str(task_id)
+            for task_id, version in self._base_versions.items()
+            if _version(self._store.rows.get(task_id)) != version
+        ]
+        if conflicts:
+            self.rollback()
+            raise ConcurrentUpdateError(
+                f"Tasks {', '.join(conflicts)} were changed concurrently"
+            )
+
+        for task_id, row in self._rows.items():
+            self._store.put_row(task_id, row)
+        for task_id, children in self._children.items():
+            if task_id in self._store.rows:
+                self._store.children[task_id] = children
+        for task_id, parents in self._parents.items():
+            if task_id in self._store.rows:
+                self._store.parents[task_id] = parents
+        self.rollback()
+
+    def rollback(self) -> None:
+        self._rows = {}
+        self._children = {}
+        self._parents = {}
+        self._base_versions = {}
+
+    def _put_row(self, task_id: UUID, row: Optional[Task]) -> None:
+        if task_id not in self._base_versions:
+            self._base_versions[task_id] = _version(self._store.rows.get(task_id))
+        self._rows[task_id] = row
+
+    def _row(self, task_id: UUID) -> Optional[Task]:
+        if task_id in self._rows:
+            return self._rows[task_id]
+        return self._store.rows.get(task_id)
+
+    def _children_of(self, task_id: UUID) -> Tuple[UUID, ...]:
+        if task_id in self._children:
+            return self._children[task_id]
+        return self._store.children.get(task_id, ())
+
+    def _parents_of(self, task_id: UUID) -> FrozenSet[UUID]:
+        if task_id in self._parents:
+            return self._parents[task_id]
+        return self._store.parents.get(task_id, frozenset())
+
+    def _all_ids(self) -> Set[UUID]:
+        ids = set(self._store.rows)
+        for task_id, row in self._rows.items():
+            if row is None:
+                ids.discard(task_id)
+            else:
+                ids.add(task_id)
+        return ids
+
+    def _load(self, task_id: UUID) -> Task:
+        row = self._row(task_id)
+        if row is None:
+            raise TaskNotFoundError(f"Task {task_id} does not exist")
+        dependents = []
+        for child_id in self._children_of(task_id):
+            child = self._row(child_id)
+            assert child is not None
+            dependents.append(DependentTask.from_task(child))
+        return row._replace(is_prerequisite_for=tuple(dependents))._as_persisted()
+
+    async def get(self, task_id: UUID) -> Task:
+        return self._load(task_id)
+
+    async def get_many(self, task_ids: Iterable[UUID]) -> List[Task]:
+        return [self._load(t) for t in task_ids if self._row(t) is not None]
+
+    async def list_existing_ids(self, task_ids: Iterable[UUID]) -> List[UUID]:
+        return [t for t in task_ids if self._row(t) is not None]
+
+    async def save(self, task: Task) -> None:
+        await self.save_many([task])
+
+    async def save_many(self, tasks: Sequence[Task]) -> List[Task]:
+        """
+        Upsert the given new tasks, and update the changed fields of the
+        given loaded ones, bumping their versions. Then add any of their
+        dependency edges that do not exist yet. Like the association table,
+        edges are never removed by saving.
+        """
+        latest = {task.id: task for task in tasks}
+
+        for task in latest.values():
+            changed = task.changed_fields
+            row = self._row(task.id)
+            if changed is None:
+                version = task.version if row is None else row.version + 1
+                self._put_row(
+                    task.id,
+                    task._replace(is_prerequisite_for=(), events=(), version=version),
+                )
+                continue
+
+            columns = changed - _NON_COLUMN_FIELDS - {"version"}
+            if columns and row is not None:
+                if row.version != task.version:
+                    raise ConcurrentUpdateError(
+                        f"Task {task.id} was changed concurrently"
+                    )
+                self._put_row(
+                    task.id,
+                    row._replace(
+                        **{c: getattr(task, c) for c in columns},
+                        version=row.version + 1,
+                    ),
+                )
+
+        for task in latest.values():
+            if (
+                task.changed_fields is not None
+                and "is_prerequisite_for" not in task.changed_fields
+            ):
+                continue
+            children = self._children_of(task.id)
+            for dependent in task.is_prerequisite_for:
+                if dependent.id in children:
+                    continue
+                if self._row(dependent.id) is None:
+                    raise TaskNotFoundError(
+                        f"Dependent task {dependent.id} does not exist"
+                    )
+                children = (*children, dependent.id)
+                self._parents[dependent.id] = self._parents_of(dependent.id) | {task.id}
+            self._children[task.id] = children
+
+        stored = []
+        for task in latest.values():
+            row = self._row(task.id)
+            assert row is not None
+            stored.append(task._replace(version=row.version, events=())._as_persisted())
+        return stored
+
+    async def delete(self, task_id: UUID) -> None:
+        """
+        Delete a task along with its dependency edges, and clear any
+        references to it as the task that others ultimately block
+        """
+        for child_id in self._children_of(task_id):
+            self._parents[child_id] = self._parents_of(child_id) - {task_id}
+        for parent_id in self._parents_of(task_id):
+            self._children[parent_id] = tuple(
+                c for c in self._children_of(parent_id) if c != task_id
+            )
+        self._children[task_id] = ()
+        self._parents[task_id] = frozenset()
+        self._put_row(task_id, None)
+
+        for other_id in self._all_ids():
+            row = self._row(other_id)
+            if row is not None and row.ultimately_blocks == task_id:
+                self._put_row(
+                    other_id,
+                    row._replace(ultimately_blocks=None, version=row.version + 1),
+                )
+
+    async def list_inactive_with_past_activation_times(self) -> List[Task]:
+        return [self._load(t) for t in self._due(datetime.utcnow())]
+
+    async def list_prerequisites_for_task(self, task_id: UUID) -> List[Task]:
+        return [self._load(t) for t in self._parents_of(task_id)]
+
+    async def list_prerequisites_for_tasks(
+        self, task_ids: Iterable[UUID]
+    ) -> List[Task]:
+        parent_ids: Dict[UUID, None] = {}
+        for task_id in task_ids:
+            parent_ids.update(dict.fromkeys(self._parents_of(task_id)))
+        return [self._load(t) for t in parent_ids]
+
+    async def list_ancestors(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ancestor_ids: Dict[UUID, None] = {}
+        frontier = list(task_ids)
+        while frontier:
+            parent_ids = [
+                p
+                for task_id in frontier
+                for p in self._parents_of(task_id)
+                if p not in ancestor_ids
+            ]
+            frontier = list(dict.fromkeys(parent_ids))
+            ancestor_ids.update(dict.fromkeys(frontier))
+        return [self._load(t) for t in ancestor_ids]
+
+    async def activate_due_tasks(self, current_time: datetime) -> List[Task]:
+        """
+        Flip every inactive task whose activation time has passed to active,
+        and return the activated tasks
+        """
+        due = self._due(current_time)
+        for task_id in due:
+            row = self._row(task_id)
+            assert row is not None
+            self._put_row(
+                task_id, row._replace(is_active=True, version=row.version + 1)
+            )
+        return [self._load(t) for t in due]
+
+    def _due(self, current_time: datetime) -> List[UUID]:
+        """
+        The committed index only knows the committed rows, so the rows
+        written within this unit of work are checked one by one
+        """
+        candidates = dict.fromkeys(self._store.due(current_time))
+        candidates.update(dict.fromkeys(self._rows))
+
+        cutoff = current_time.replace(tzinfo=None)
+        due = []
+        for task_id in candidates:
+            row = self._row(task_id)
+            if (
+                row is not None
+                and not row.is_active
+                and row.activation_time.replace(tzinfo=None) <= cutoff
+            ):
+                due.append(task_id)
+        return due
@@ -1,12 +1,20 @@
 from typing import Any
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.ext.asyncio.engine import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
-from whatdo2.config import POSTGRES_URI
+from whatdo2.adapters.database import get_engine
 
 Base = declarative_base()
 
@@ -16,6 +24,12 @@ class Association(Base):
     parent_id: str = Column(ForeignKey("task.id"), primary_key=True)
     child_id: str = Column(ForeignKey("task.id"), primary_key=True)
 
+    __table_args__ = (
+        # The primary key only covers lookups by parent, and prerequisites are
+        # looked up by child
+        Index("ix_association_child_id", child_id),
+    )
+
 
 class TaskDBModel(Base):
     __tablename__ = "task"
@@ -29,6 +43,7 @@ class TaskDBModel(Base):
     activation_time = Column(DateTime())
     is_active = Column(Boolean())
     ultimately_blocks: str = Column(ForeignKey("task.id"), nullable=True)
+    version = Column(Integer(), nullable=False, default=0, server_default="0")
     is_prerequisite_for: Any = relationship(
         "TaskDBModel",
         secondary=Association.__table__,
@@ -36,11 +51,22 @@ class TaskDBModel(Base):
         secondaryjoin=(Association.__table__.c.child_id == id),
     )
 
+    __table_args__ = (
+        # Supports the keyset pagination of the task list
+        Index("ix_task_effective_density_id", effective_density.desc(), id),
+        # Supports picking the next tasks to do, of a type
+        Index(
+            "ix_task_active_task_type_effective_density_id",
+            task_type,
+            effective_density.desc(),
+            id,
+            postgresql_where=is_active.is_(True),
+        ),
+    )
 
-async def delete_and_create_tables() -> None:
-    engine = create_async_engine(POSTGRES_URI, echo=True)
 
+async def delete_and_create_tables() -> None:
     meta = Base.metadata
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(meta.drop_all)
         await conn.run_sync(meta.create_all)
@@ -1,14 +1,32 @@
+from collections import defaultdict
 from datetime import datetime
-from typing import List, cast
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, cast
 from uuid import UUID
 
+from sqlalchemy import bindparam, delete, not_, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.expression import Update
 
 from whatdo2.adapters.orm import Association, TaskDBModel
-from whatdo2.adapters.task_repository import TaskRepository
+from whatdo2.adapters.task_repository import (
+    ConcurrentUpdateError,
+    TaskNotFoundError,
+    TaskRepository,
+)
 from whatdo2.domain.task.core import Task
+from whatdo2.metrics import REPOSITORY_SECONDS
+
+# Keeps multi-row INSERTs well below the bind parameter limit of asyncpg
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# The version is only ever bumped by the repository itself
+_UPDATABLE_COLUMNS = frozenset(
+    c.name for c in TaskDBModel.__table__.c if not c.primary_key and c.name != "version"
+)
 
 
 class SQLTaskRepository(TaskRepository):
@@ -26,37 +44,182 @@ class SQLTaskRepository(TaskRepository):
         )
         return cast(TaskDBModel, result.scalar_one())
 
+    @REPOSITORY_SECONDS.timed
     async def get(self, task_id: UUID) -> Task:
         result = await self._session.execute(
             select(TaskDBModel)
             .filter_by(id=str(task_id))
             .options(selectinload(TaskDBModel.is_prerequisite_for))
         )
-        db_task = result.scalar_one()
+        try:
+            db_task = result.scalar_one()
+        except NoResultFound as e:
+            raise TaskNotFoundError(f"Task {task_id} does not exist") from e
         return Task.from_orm(db_task)
 
+    @REPOSITORY_SECONDS.timed
+    async def get_many(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ids = [str(t) for t in task_ids]
+        if not ids:
+            return []
+
+        many_results = await self._session.execute(
+            select(TaskDBModel)
+            .filter(TaskDBModel.id.in_(ids))
+            .options(selectinload(TaskDBModel.is_prerequisite_for))
+        )
+        db_tasks = {t.id: t for t in many_results.scalars().all()}
+        return [Task.from_orm(db_tasks[i]) for i in ids if i in db_tasks]
+
+    @REPOSITORY_SECONDS.timed
+    async def list_existing_ids(self, task_ids: Iterable[UUID]) -> List[UUID]:
+        """
+        Look the ids up in chunks, to stay below the bind parameter limit
+        """
+        task_table = TaskDBModel.__table__
+        existing: List[UUID] = []
+        for chunk in _chunks([str(t) for t in task_ids]):
+            results = await self._session.execute(
+                select(task_table.c.id).where(task_table.c.id.in_(chunk))
+            )
+            existing.extend(UUID(str(task_id)) for task_id in results.scalars())
+        return existing
+
     async def save(self, task: Task) -> None:
-        raw_task = task.to_raw()
-        raw_task["id"] = str(raw_task["id"])
-        raw_task["ultimately_blocks"] = (
-            str(raw_task["ultimately_blocks"])
-            if raw_task["ultimately_blocks"] is not None
-            else None
-        )
-        is_prerequisite_for = raw_task.pop("is_prerequisite_for")
-
-        task_db_model = TaskDBModel(**raw_task)
-        await self._session.merge(task_db_model)
-
-        for t in is_prerequisite_for:
-            assoc = Association(
-                parent_id=task_db_model.id,
-                child_id=str(t["id"]),
+        await self.save_many([task])
+
+    @REPOSITORY_SECONDS.timed
+    async def save_many(self, tasks: Sequence[Task]) -> List[Task]:
+        """
+        Write the given tasks and their new dependency edges back. New tasks
+        are upserted with one multi-row INSERT per chunk. Tasks loaded from
+        the database only have their changed columns updated, with one
+        executemany UPDATE per set of changed columns, and are skipped if
+        nothing changed. Committing is left to the unit of work.
+
+        Updated tasks must still be at the version they were loaded at, or
+        ConcurrentUpdateError is raised, and their version is bumped.
+        """
+        # A row may only be written once per statement, so the last version
+        # of a task wins
+        latest = {task.id: task for task in tasks}
+
+        new_rows: List[Dict[str, Any]] = []
+        updates: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+        association_rows: List[Dict[str, str]] = []
+        stored: Dict[UUID, Task] = {}
+        for task in latest.values():
+            changed = task.changed_fields
+            if changed is None:
+                new_rows.append(_to_row(task))
+            else:
+                columns = tuple(sorted(changed & _UPDATABLE_COLUMNS))
+                if columns:
+                    row = _to_row(task)
+                    updates[columns].append(
+                        {
+                            "b_id": row["id"],
+                            "b_version": task.version,
+                            **{f"b_{c}": row[c] for c in columns},
+                        }
+                    )
+                    stored[task.id] = task._replace(version=task.version + 1)
+                else:
+                    stored[task.id] = task
+
+            if changed is None or "is_prerequisite_for" in changed:
+                association_rows.extend(
+                    {"parent_id": str(task.id), "child_id": str(t.id)}
+                    for t in task.is_prerequisite_for
+                )
+
+        task_table = TaskDBModel.__table__
+        # The ultimately_blocks foreign key is checked at the end of each
+        # INSERT, and new rows may span several
+        for chunk in _chunks(_targets_first(new_rows)):
+            stmt = insert(task_table).values(chunk)
+            versions = await self._session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[task_table.c.id],
+                    set_={
+                        **{c: stmt.excluded[c] for c in _UPDATABLE_COLUMNS},
+                        "version": task_table.c.version + 1,
+                    },
+                ).returning(task_table.c.id, task_table.c.version)
+            )
+            for task_id, version in versions.all():
+                task = latest[UUID(str(task_id))]
+                stored[task.id] = task._replace(version=version)
+
+        await self._lock_versions(
+            [p for params in updates.values() for p in params],
+        )
+        for columns, params in updates.items():
+            await self._session.execute(_update_statement(columns), params)
+
+        # Snapshots of dependents being refreshed also count as a change, so
+        # existing edges are left alone rather than rewritten
+        for chunk in _chunks(association_rows):
+            await self._session.execute(
+                insert(Association.__table__).values(chunk).on_conflict_do_nothing()
+            )
+
+        # The rows were written behind the ORM's back
+        self._session.expire_all()
+        return [
+            stored[task_id]._replace(events=())._as_persisted() for task_id in latest
+        ]
+
+    async def _lock_versions(self, params: List[Dict[str, Any]]) -> None:
+        """
+        Lock the rows about to be updated, and check that they are still at
+        the versions they were loaded at. The number of rows matched by an
+        executemany UPDATE is not reported by every driver, so the versions
+        are compared here instead, and the locks keep them from changing
+        before the UPDATE.
+        """
+        task_table = TaskDBModel.__table__
+        for chunk in _chunks(params):
+            expected = {p["b_id"]: p["b_version"] for p in chunk}
+            results = await self._session.execute(
+                select(task_table.c.id, task_table.c.version)
+                .where(task_table.c.id.in_(list(expected)))
+                .with_for_update()
             )
-            await self._session.merge(assoc)
+            current = {str(task_id): version for task_id, version in results.all()}
+            conflicts = [i for i, v in expected.items() if current.get(i) != v]
+            if conflicts:
+                raise ConcurrentUpdateError(
+                    f"Tasks {', '.join(conflicts)} were changed concurrently"
+                )
 
-        await self._session.commit()
+    @REPOSITORY_SECONDS.timed
+    async def delete(self, task_id: UUID) -> None:
+        """
+        Delete a task along with its dependency edges, and clear any
+        references to it as the task that others ultimately block
+        """
+        association_table = Association.__table__
+        task_table = TaskDBModel.__table__
+        await self._session.execute(
+            delete(association_table).where(
+                or_(
+                    association_table.c.parent_id == str(task_id),
+                    association_table.c.child_id == str(task_id),
+                )
+            )
+        )
+        await self._session.execute(
+            update(task_table)
+            .where(task_table.c.ultimately_blocks == str(task_id))
+            .values(ultimately_blocks=None, version=task_table.c.version + 1)
+        )
+        await self._session.execute(
+            delete(task_table).where(task_table.c.id == str(task_id))
+        )
+        self._session.expire_all()
 
+    @REPOSITORY_SECONDS.timed
     async def list_inactive_with_past_activation_times(self) -> List[Task]:
         many_results = await self._session.execute(
             select(TaskDBModel)
@@ -70,6 +233,7 @@ class SQLTaskRepository(TaskRepository):
         db_tasks = many_results.scalars().all()
         return [Task.from_orm(t) for t in db_tasks]
 
+    @REPOSITORY_SECONDS.timed
     async def list_prerequisites_for_task(self, task_id: UUID) -> List[Task]:
         many_results = await self._session.execute(
             select(TaskDBModel)
@@ -80,3 +244,139 @@ class SQLTaskRepository(TaskRepository):
 
         db_tasks = many_results.scalars().all()
         return [Task.from_orm(t) for t in db_tasks]
+
+    @REPOSITORY_SECONDS.timed
+    async def list_prerequisites_for_tasks(
+        self, task_ids: Iterable[UUID]
+    ) -> List[Task]:
+        many_results = await self._session.execute(
+            select(TaskDBModel)
+            .join(Association, onclause=(TaskDBModel.id == Association.parent_id))
+            .filter(Association.child_id.in_([str(t) for t in task_ids]))
+            .distinct()
+            .options(selectinload(TaskDBModel.is_prerequisite_for))
+        )
+
+        db_tasks = many_results.scalars().all()
+        return [Task.from_orm(t) for t in db_tasks]
+
+    @REPOSITORY_SECONDS.timed
+    async def list_ancestors(self, task_ids: Iterable[UUID]) -> List[Task]:
+        """
+        Return all of the transitive prerequisites of the given tasks, with
+        their dependents, in a single query
+        """
+        ids = [str(t) for t in task_ids]
+        if not ids:
+            return []
+
+        # UNION rather than UNION ALL, so that shared ancestors are only
+        # walked once
+        ancestors = (
+            select(Association.parent_id)
+            .filter(Association.child_id.in_(ids))
+            .cte("ancestors", recursive=True)
+        )
+        ancestors = ancestors.union(
+            select(Association.parent_id).join(
+                ancestors, Association.child_id == ancestors.c.parent_id
+            )
+        )
+
+        # Joined, rather than selectin, to avoid a second round trip
+        many_results = await self._session.execute(
+            select(TaskDBModel)
+            .filter(TaskDBModel.id.in_(select(ancestors.c.parent_id)))
+            .options(joinedload(TaskDBModel.is_prerequisite_for))
+        )
+
+        db_tasks = many_results.unique().scalars().all()
+        return [Task.from_orm(t) for t in db_tasks]
+
+    @REPOSITORY_SECONDS.timed
+    async def activate_due_tasks(self, current_time: datetime) -> List[Task]:
+        """
+        Flip every inactive task whose activation time has passed to active,
+        in a single UPDATE, and return the activated tasks.
+
+        Due tasks locked by a concurrent sweep are skipped rather than waited
+        for, so that several workers split the sweep between them instead of
+        repeating each other's work.
+        """
+        table = TaskDBModel.__table__
+        due = (
+            select(table.c.id)
+            .where(table.c.activation_time <= current_time)
+            .where(not_(table.c.is_active))
+            .with_for_update(skip_locked=True)
+        )
+        activated = await self._session.execute(
+            update(table)
+            .where(table.c.id.in_(due.scalar_subquery()))
+            .values(is_active=True, version=table.c.version + 1)
+            .returning(table.c.id)
+        )
+        activated_ids = activated.scalars().all()
+        if not activated_ids:
+            return []
+
+        many_results = await self._session.execute(
+            select(TaskDBModel)
+            .filter(TaskDBModel.id.in_(activated_ids))
+            .options(selectinload(TaskDBModel.is_prerequisite_for))
+            .execution_options(populate_existing=True)
+        )
+
+        db_tasks = many_results.scalars().all()
+        return [Task.from_orm(t) for t in db_tasks]
+
+
+def _to_row(task: Task) -> Dict[str, Any]:
+    row = {column: getattr(task, column) for column in _UPDATABLE_COLUMNS}
+    row["id"] = str(task.id)
+    row["version"] = task.version
+    if task.ultimately_blocks is not None:
+        row["ultimately_blocks"] = str(task.ultimately_blocks)
+    return row
+
+
+def _targets_first(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Order new rows so that every row comes after the row of the task it
+    ultimately blocks, when that task is new too
+    """
+    pending = {row["id"]: row for row in rows}
+    ordered: List[Dict[str, Any]] = []
+    for row_id in list(pending):
+        chain: List[Dict[str, Any]] = []
+        while row_id in pending:
+            row = pending.pop(row_id)
+            chain.append(row)
+            row_id = row["ultimately_blocks"]
+        ordered.extend(reversed(chain))
+    return ordered
+
+
+def _update_statement(columns: Sequence[str]) -> Update:
+    """
+    An UPDATE of the given columns, and a bump of the version, for one task
+    at the version it was loaded at. Executed with the parameters of many.
+    """
+    task_table = TaskDBModel.__table__
+    return (
+        update(task_table)
+        .where(task_table.c.id == bindparam("b_id"))
+        .where(task_table.c.version == bindparam("b_version"))
+        .values(
+            {
+                **{c: bindparam(f"b_{c}") for c in columns},
+                "version": task_table.c.version + 1,
+            }
+        )
+    )
+
+
+def _chunks(rows: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        end = start + BULK_INSERT_CHUNK_SIZE
+        yield rows[start:end]
@@ -1,17 +1,43 @@
 from abc import ABCMeta
-from typing import List
+from datetime import datetime
+from typing import Iterable, List, Sequence
 from uuid import UUID
 
 from whatdo2.domain.task.core import Task
 
 
+class TaskNotFoundError(Exception):
+    pass
+
+
+class ConcurrentUpdateError(Exception):
+    """
+    Raised when a task was changed by someone else since it was loaded
+    """
+
+
 class TaskRepository(metaclass=ABCMeta):
     async def save(self, task: Task) -> None:
         ...
 
+    async def save_many(self, tasks: Sequence[Task]) -> List[Task]:
+        """
+        Return the given tasks as they are now stored
+        """
+        ...
+
     async def get(self, task_id: UUID) -> Task:
         ...
 
+    async def get_many(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ...
+
+    async def list_existing_ids(self, task_ids: Iterable[UUID]) -> List[UUID]:
+        """
+        Return those of the given ids that belong to stored tasks
+        """
+        ...
+
     async def delete(self, task_id: UUID) -> None:
         ...
 
@@ -20,3 +46,14 @@ class TaskRepository(metaclass=ABCMeta):
 
     async def list_prerequisites_for_task(self, task_id: UUID) -> List[Task]:
         ...
+
+    async def list_prerequisites_for_tasks(
+        self, task_ids: Iterable[UUID]
+    ) -> List[Task]:
+        ...
+
+    async def list_ancestors(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ...
+
+    async def activate_due_tasks(self, current_time: datetime) -> List[Task]:
+        ...
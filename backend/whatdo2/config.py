@@ -4,6 +4,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Debug messages are only formatted, and logged, when asked for
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Served at /metrics. When off, the timed functions are left undecorated.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_USER = os.getenv("POSTGRES_USER", "whatdo2")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "whatdo2")
@@ -13,3 +18,45 @@ POSTGRES_URI = (
     f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}"
     f":5432/{POSTGRES_DB}"
 )
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Connections opened on startup, before the app reports ready
+DB_POOL_WARM_CONNECTIONS = int(os.getenv("DB_POOL_WARM_CONNECTIONS", "4"))
+
+ACTIVATION_RESYNC_INTERVAL = float(os.getenv("ACTIVATION_RESYNC_INTERVAL", "300"))
+ACTIVATION_RETRY_DELAY = float(os.getenv("ACTIVATION_RETRY_DELAY", "10"))
+
+STARTUP_RETRY_DELAY = float(os.getenv("STARTUP_RETRY_DELAY", "5"))
+
+TASK_LIST_CACHE_SIZE = int(os.getenv("TASK_LIST_CACHE_SIZE", "256"))
+TASK_LIST_CACHE_TTL = float(os.getenv("TASK_LIST_CACHE_TTL", "5"))
+# Task lists longer than this are streamed, and not cached
+TASK_LIST_STREAM_THRESHOLD = int(os.getenv("TASK_LIST_STREAM_THRESHOLD", "500"))
+
+# Attempts at a command whose tasks keep being changed concurrently
+COMMAND_MAX_ATTEMPTS = int(os.getenv("COMMAND_MAX_ATTEMPTS", "3"))
+
+# Seconds after which the next task index is reloaded, to take in the
+# changes made by other workers
+NEXT_TASK_INDEX_MAX_AGE = float(os.getenv("NEXT_TASK_INDEX_MAX_AGE", "30"))
+
+# Tasks a client of the update feed can fall behind by before it is reset
+TASK_FEED_MAX_PENDING = int(os.getenv("TASK_FEED_MAX_PENDING", "1000"))
+# Dispatches kept for clients resuming the update feed
+TASK_FEED_HISTORY = int(os.getenv("TASK_FEED_HISTORY", "256"))
+# Seconds over which the changes sent to a client are merged
+TASK_FEED_COALESCE_DELAY = float(os.getenv("TASK_FEED_COALESCE_DELAY", "0.25"))
+TASK_FEED_KEEPALIVE = float(os.getenv("TASK_FEED_KEEPALIVE", "15"))
+
+EVENTBUS_MAX_CONCURRENCY = int(os.getenv("EVENTBUS_MAX_CONCURRENCY", "8"))
+
+# "process", "thread" or "inline"
+GRAPH_EXECUTOR = os.getenv("GRAPH_EXECUTOR", "process")
+GRAPH_EXECUTOR_THRESHOLD = int(os.getenv("GRAPH_EXECUTOR_THRESHOLD", "2000"))
+GRAPH_EXECUTOR_MAX_WORKERS = int(os.getenv("GRAPH_EXECUTOR_MAX_WORKERS", "2"))
+# "object", or "numpy" (needs the vectorized extra)
+GRAPH_ENGINE = os.getenv("GRAPH_ENGINE", "object")
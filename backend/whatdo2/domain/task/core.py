@@ -1,10 +1,7 @@
 import uuid
-from dataclasses import fields as dc_fields
 from datetime import datetime
 from enum import Enum
-from typing import Any, List, Optional, Tuple, Type
-
-from pydantic.dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Type
 
 from whatdo2.domain.task.events import TaskActivated, TaskDeactivated, TaskEvent
 from whatdo2.domain.typedefs import Entity
@@ -21,8 +18,15 @@ class TaskType(str, Enum):
     WORK = "WORK"
 
 
-@dataclass(frozen=True)
 class BaseTask(Entity):
+    __slots__ = (
+        "name",
+        "importance",
+        "task_type",
+        "time",
+        "activation_time",
+        "is_active",
+    )
     name: str
     importance: int
     task_type: TaskType
@@ -31,24 +35,46 @@ class BaseTask(Entity):
     is_active: bool
 
 
-@dataclass(frozen=True)
 class DependentTask(BaseTask):
+    __slots__ = ("density", "effective_density", "ultimately_blocks")
     density: float
     effective_density: float
-    ultimately_blocks: Optional[uuid.UUID] = None
+    ultimately_blocks: Optional[uuid.UUID]
+
+    _defaults: ClassVar[Dict[str, Any]] = {"ultimately_blocks": None}
 
     @classmethod
     def from_task(cls: Type["DependentTask"], t: "Task") -> "DependentTask":
-        return cls.from_orm(t)  # type: ignore
+        # The task is already valid, so there is nothing to validate
+        return cls._construct(**{name: getattr(t, name) for name in cls._fields})
 
 
-@dataclass(frozen=True)
 class Task(BaseTask):
-    density: Optional[float] = None
-    effective_density: Optional[float] = None
-    ultimately_blocks: Optional[uuid.UUID] = None
-    is_prerequisite_for: Tuple[DependentTask, ...] = ()
-    events: Tuple[TaskEvent, ...] = ()
+    __slots__ = (
+        "density",
+        "effective_density",
+        "ultimately_blocks",
+        "is_prerequisite_for",
+        "events",
+        "version",
+    )
+    density: Optional[float]
+    effective_density: Optional[float]
+    ultimately_blocks: Optional[uuid.UUID]
+    is_prerequisite_for: Tuple[DependentTask, ...]
+    events: Tuple[TaskEvent, ...]
+    # Bumped by the repositories on every write of the stored task, to detect
+    # concurrent updates
+    version: int
+
+    _defaults: ClassVar[Dict[str, Any]] = {
+        "density": None,
+        "effective_density": None,
+        "ultimately_blocks": None,
+        "is_prerequisite_for": (),
+        "events": (),
+        "version": 0,
+    }
 
     @classmethod
     def new(
@@ -73,11 +99,10 @@ class Task(BaseTask):
 
     @classmethod
     def from_orm(cls, orm: Any) -> "Task":
-        fields = dc_fields(cls)
         constr_dict = {
-            field.name: getattr(orm, field.name)
-            for field in fields
-            if hasattr(orm, field.name) and field.name != "is_prerequisite_for"
+            name: getattr(orm, name)
+            for name in cls._fields
+            if hasattr(orm, name) and name != "is_prerequisite_for"
         }
 
         constr_dict["is_prerequisite_for"] = [
@@ -88,7 +113,7 @@ class Task(BaseTask):
                 (),
             )
         ]
-        return cls(**constr_dict)
+        return cls(**constr_dict)._as_persisted()
 
     def ensure_valid_state(self) -> "Task":
         """
@@ -98,7 +123,11 @@ class Task(BaseTask):
 
         sorted_dep_tasks_by_ed = list(
             dt
-            for dt in sorted(self.is_prerequisite_for, key=lambda t: t.is_active)
+            for dt in sorted(
+                self.is_prerequisite_for,
+                key=lambda t: t.effective_density,
+                reverse=True,
+            )
             if dt.is_active
         )
 
@@ -134,7 +163,7 @@ class Task(BaseTask):
 
         return self._replace(
             density=density,
-            effective_density=effective_density if self.is_active else 0,
+            effective_density=effective_density if self.is_active else 0.0,
             ultimately_blocks=ultimately_blocks,
         )
 
@@ -1,4 +1,5 @@
 import dataclasses as dc
+from datetime import datetime
 from uuid import UUID
 
 from whatdo2.domain.typedefs import DomainEvent
@@ -16,9 +17,32 @@ class TaskCreated(TaskEvent):
 
 @dc.dataclass(frozen=True)
 class TaskActivated(TaskEvent):
-    pass
+    # Whether the prerequisites of the task were recomputed along with it,
+    # as they are by the activation sweep
+    prerequisites_updated: bool = False
 
 
 @dc.dataclass(frozen=True)
 class TaskDeactivated(TaskEvent):
     pass
+
+
+@dc.dataclass(frozen=True)
+class TaskDependentsChanged(TaskEvent):
+    pass
+
+
+@dc.dataclass(frozen=True)
+class TaskActivationScheduled(TaskEvent):
+    activation_time: datetime
+
+
+@dc.dataclass(frozen=True)
+class TaskRankChanged(TaskEvent):
+    """
+    The values that tasks are picked in the order of, as written
+    """
+
+    task_type: str
+    is_active: bool
+    effective_density: float
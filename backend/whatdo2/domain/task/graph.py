@@ -0,0 +1,432 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from whatdo2.domain.task.core import (
+    PRIORITY_DENSITY_MARGIN,
+    DependentTask,
+    Task,
+    TaskCircularDependencyError,
+)
+
+
+@dataclass
+class _Node:
+    density: float
+    is_active: bool
+    effective_density: float
+    ultimately_blocks: Optional[UUID]
+    # A pinned node is a DependentTask snapshot of a task that lives outside
+    # of the graph: its values are taken as given rather than computed.
+    pinned: bool = False
+
+
+@dataclass(frozen=True)
+class CompactGraph:
+    """
+    A compact, picklable form of a set of tasks and the edges between them,
+    to hand a computation over to another thread or process. Tasks are
+    referred to by their index in ids.
+    """
+
+    ids: Tuple[UUID, ...]
+    importance: Tuple[int, ...]
+    time: Tuple[int, ...]
+    is_active: Tuple[bool, ...]
+    # (prerequisite, dependent) pairs, with the dependents of each task in
+    # the order they were added
+    edges: Tuple[Tuple[int, int], ...]
+    # Dependents outside of the set of tasks, with their snapshot values of
+    # density, effective_density and ultimately_blocks
+    pinned: Tuple[Tuple[int, float, float, Optional[UUID]], ...]
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Task]) -> "CompactGraph":
+        tasks = list(tasks)
+        index: Dict[UUID, int] = {t.id: i for i, t in enumerate(tasks)}
+        ids = [t.id for t in tasks]
+        importance = [t.importance for t in tasks]
+        time = [t.time for t in tasks]
+        is_active = [t.is_active for t in tasks]
+        edges: List[Tuple[int, int]] = []
+        pinned: List[Tuple[int, float, float, Optional[UUID]]] = []
+
+        for parent_index, task in enumerate(tasks):
+            for dependent in task.is_prerequisite_for:
+                child_index = index.get(dependent.id)
+                if child_index is None:
+                    child_index = index[dependent.id] = len(ids)
+                    ids.append(dependent.id)
+                    importance.append(dependent.importance)
+                    time.append(dependent.time)
+                    is_active.append(dependent.is_active)
+                    pinned.append(
+                        (
+                            child_index,
+                            dependent.density,
+                            dependent.effective_density,
+                            dependent.ultimately_blocks,
+                        )
+                    )
+                edges.append((parent_index, child_index))
+
+        return cls(
+            ids=tuple(ids),
+            importance=tuple(importance),
+            time=tuple(time),
+            is_active=tuple(is_active),
+            edges=tuple(edges),
+            pinned=tuple(pinned),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class ComputedGraph:
+    """
+    The computed values of a set of tasks, as found by a TaskGraph
+    """
+
+    def __init__(self, nodes: Dict[UUID, _Node]) -> None:
+        self._nodes = nodes
+
+    @classmethod
+    def from_values(
+        cls,
+        ids: Sequence[UUID],
+        is_active: Sequence[bool],
+        density: Sequence[float],
+        effective_density: Sequence[float],
+        ultimately_blocks: Sequence[Optional[UUID]],
+        pinned: Sequence[bool],
+    ) -> "ComputedGraph":
+        return cls(
+            {
+                task_id: _Node(
+                    density=d,
+                    is_active=a,
+                    effective_density=ed,
+                    ultimately_blocks=ub,
+                    pinned=p,
+                )
+                for task_id, a, d, ed, ub, p in zip(
+                    ids,
+                    is_active,
+                    density,
+                    effective_density,
+                    ultimately_blocks,
+                    pinned,
+                )
+            }
+        )
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def effective_density(self, task_id: UUID) -> float:
+        return self._nodes[task_id].effective_density
+
+    def ultimately_blocks(self, task_id: UUID) -> Optional[UUID]:
+        return self._nodes[task_id].ultimately_blocks
+
+    def is_active(self, task_id: UUID) -> bool:
+        return self._nodes[task_id].is_active
+
+    def apply(self, task: Task) -> Task:
+        """
+        Return the given task with its computed values, and the snapshots of
+        the tasks it is a prerequisite for, taken from the graph
+        """
+        node = self._nodes[task.id]
+        return task._replace(
+            is_active=node.is_active,
+            density=node.density,
+            effective_density=node.effective_density,
+            ultimately_blocks=node.ultimately_blocks,
+            is_prerequisite_for=tuple(
+                self._refresh_snapshot(dt) for dt in task.is_prerequisite_for
+            ),
+        )
+
+    def _refresh_snapshot(self, dependent: DependentTask) -> DependentTask:
+        node = self._nodes.get(dependent.id)
+        if (
+            node is None
+            or node.pinned
+            or (
+                dependent.is_active,
+                dependent.effective_density,
+                dependent.ultimately_blocks,
+            )
+            == (node.is_active, node.effective_density, node.ultimately_blocks)
+        ):
+            return dependent
+        return dependent._replace(
+            is_active=node.is_active,
+            effective_density=node.effective_density,
+            ultimately_blocks=node.ultimately_blocks,
+        )
+
+
+class TaskGraph(ComputedGraph):
+    """
+    The prerequisite DAG of a set of tasks.
+
+    Edges point from a task to the tasks it is a prerequisite for. Every
+    effective_density and ultimately_blocks is computed in a single
+    topological pass (children before parents), and later changes to an edge
+    or to an activation flag only re-evaluate the ancestors they can affect.
+    """
+
+    def __init__(self) -> None:
+        super().__init__({})
+        # Dicts rather than sets, so that children keep their insertion order
+        # and ties are broken in the same way as Task.ensure_valid_state
+        self._children: Dict[UUID, Dict[UUID, None]] = {}
+        self._parents: Dict[UUID, Set[UUID]] = {}
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Task]) -> "TaskGraph":
+        graph = cls()
+        for task in tasks:
+            graph.add_task(task)
+        graph.compute()
+        return graph
+
+    @classmethod
+    def from_compact(cls, compact: CompactGraph) -> "TaskGraph":
+        graph = cls()
+        for task_id, importance, time, is_active in zip(
+            compact.ids, compact.importance, compact.time, compact.is_active
+        ):
+            graph._nodes[task_id] = _Node(
+                density=float(importance / time),
+                is_active=is_active,
+                effective_density=0.0,
+                ultimately_blocks=None,
+            )
+            graph._children[task_id] = {}
+            graph._parents[task_id] = set()
+        for index, density, effective_density, ultimately_blocks in compact.pinned:
+            node = graph._nodes[compact.ids[index]]
+            node.density = density
+            node.effective_density = effective_density
+            node.ultimately_blocks = ultimately_blocks
+            node.pinned = True
+        for parent_index, child_index in compact.edges:
+            graph._link(compact.ids[parent_index], compact.ids[child_index])
+        graph.compute()
+        return graph
+
+    def computed(self) -> ComputedGraph:
+        """
+        Return the computed values alone, without the edges
+        """
+        return ComputedGraph(self._nodes)
+
+    def add_task(self, task: Task) -> None:
+        """
+        Add a task, and the edges to the tasks it is a prerequisite for, to
+        the graph. Dependents not (yet) in the graph are pinned to their
+        snapshot values. Call compute afterwards to refresh the graph.
+        """
+        self._nodes[task.id] = _Node(
+            density=float(task.importance / task.time),
+            is_active=task.is_active,
+            effective_density=0.0,
+            ultimately_blocks=None,
+        )
+        self._children.setdefault(task.id, {})
+        self._parents.setdefault(task.id, set())
+        for dependent in task.is_prerequisite_for:
+            if dependent.id not in self._nodes:
+                self._add_pinned(dependent)
+            self._link(task.id, dependent.id)
+
+    def _add_pinned(self, dependent: DependentTask) -> None:
+        self._nodes[dependent.id] = _Node(
+            density=dependent.density,
+            is_active=dependent.is_active,
+            effective_density=dependent.effective_density,
+            ultimately_blocks=dependent.ultimately_blocks,
+            pinned=True,
+        )
+        self._children.setdefault(dependent.id, {})
+        self._parents.setdefault(dependent.id, set())
+
+    def _link(self, parent_id: UUID, child_id: UUID) -> None:
+        self._children[parent_id][child_id] = None
+        self._parents[child_id].add(parent_id)
+
+    def ancestors(self, task_ids: Iterable[UUID]) -> Set[UUID]:
+        """
+        Return every task that is, transitively, a prerequisite of the given
+        tasks (excluding the given tasks themselves, unless part of a cycle)
+        """
+        seen: Set[UUID] = set()
+        queue: Deque[UUID] = deque(task_ids)
+        while queue:
+            for parent_id in self._parents[queue.popleft()]:
+                if parent_id not in seen:
+                    seen.add(parent_id)
+                    queue.append(parent_id)
+        return seen
+
+    def compute(self) -> None:
+        """
+        Compute every task in the graph in one topological pass.
+
+        Raises TaskCircularDependencyError if the graph has a cycle.
+        """
+        self._recompute(set(self._nodes), self._nodes.keys())
+
+    def set_is_active(self, task_id: UUID, is_active: bool) -> Set[UUID]:
+        """
+        Change a task's activation flag, returning the ids of the tasks whose
+        computed values changed as a result
+        """
+        node = self._nodes[task_id]
+        if node.is_active == is_active:
+            return set()
+        node.is_active = is_active
+        # The parents read the flag directly, so they are dirty as well
+        return self._propagate([task_id], [task_id, *self._parents[task_id]])
+
+    def add_edge(self, parent_id: UUID, child_id: UUID) -> Set[UUID]:
+        """
+        Make parent_id a prerequisite of child_id, returning the ids of the
+        tasks whose computed values changed as a result.
+
+        Raises TaskCircularDependencyError, leaving the graph untouched, if
+        the edge would close a cycle.
+        """
+        if child_id in self._children[parent_id]:
+            return set()
+        if parent_id == child_id or parent_id in self._descendants(child_id):
+            raise TaskCircularDependencyError(
+                "Task ultimately blocks itself, so there is a circular dependency",
+            )
+        self._link(parent_id, child_id)
+        return self._propagate([parent_id])
+
+    def remove_edge(self, parent_id: UUID, child_id: UUID) -> Set[UUID]:
+        """
+        Remove the edge between the two tasks, returning the ids of the tasks
+        whose computed values changed as a result
+        """
+        if child_id not in self._children[parent_id]:
+            return set()
+        del self._children[parent_id][child_id]
+        self._parents[child_id].discard(parent_id)
+        return self._propagate([parent_id])
+
+    def _descendants(self, task_id: UUID) -> Set[UUID]:
+        seen: Set[UUID] = set()
+        stack: List[UUID] = [task_id]
+        while stack:
+            for child_id in self._children[stack.pop()]:
+                if child_id not in seen:
+                    seen.add(child_id)
+                    stack.append(child_id)
+        return seen
+
+    def _propagate(
+        self, task_ids: List[UUID], dirty: Optional[List[UUID]] = None
+    ) -> Set[UUID]:
+        affected = self.ancestors(task_ids) | set(task_ids)
+        return self._recompute(affected, task_ids if dirty is None else dirty)
+
+    def _recompute(self, affected: Set[UUID], dirty: Iterable[UUID]) -> Set[UUID]:
+        """
+        Re-evaluate the affected tasks children-first (Kahn's algorithm over
+        the reversed edges), skipping any task that is not itself dirty and
+        none of whose children changed. Returns the ids of changed tasks.
+        """
+        to_evaluate = set(dirty)
+        pending_children = {
+            task_id: sum(1 for c in self._children[task_id] if c in affected)
+            for task_id in affected
+        }
+        ready = deque(t for t, count in pending_children.items() if count == 0)
+
+        changed: Set[UUID] = set()
+        visited = 0
+        while ready:
+            task_id = ready.popleft()
+            visited += 1
+            if task_id in to_evaluate and self._evaluate(task_id):
+                changed.add(task_id)
+                to_evaluate.update(self._parents[task_id])
+            for parent_id in self._parents[task_id]:
+                if parent_id in affected:
+                    pending_children[parent_id] -= 1
+                    if pending_children[parent_id] == 0:
+                        ready.append(parent_id)
+
+        if visited != len(affected):
+            raise TaskCircularDependencyError(
+                "Task ultimately blocks itself, so there is a circular dependency",
+            )
+        return changed
+
+    def _evaluate(self, task_id: UUID) -> bool:
+        """
+        Compute a single task from its (already computed) children, in the
+        same way as Task.ensure_valid_state. Returns whether anything changed.
+        """
+        node = self._nodes[task_id]
+        if node.pinned:
+            return False
+
+        highest: Optional[UUID] = None
+        highest_ed = 0.0
+        for child_id in self._children[task_id]:
+            child = self._nodes[child_id]
+            if child.is_active and (
+                highest is None or child.effective_density > highest_ed
+            ):
+                highest = child_id
+                highest_ed = child.effective_density
+
+        effective_density = node.density
+        ultimately_blocks = None
+        if highest is not None and highest_ed > effective_density:
+            effective_density = highest_ed + PRIORITY_DENSITY_MARGIN
+            highest_ub = self._nodes[highest].ultimately_blocks
+            ultimately_blocks = highest if highest_ub is None else highest_ub
+
+        if ultimately_blocks == task_id:
+            raise TaskCircularDependencyError(
+                "Task ultimately blocks itself, so there is a circular dependency",
+            )
+
+        if not node.is_active:
+            effective_density = 0.0
+        if (node.effective_density, node.ultimately_blocks) == (
+            effective_density,
+            ultimately_blocks,
+        ):
+            return False
+        node.effective_density = effective_density
+        node.ultimately_blocks = ultimately_blocks
+        return True
+
+
+def compute_compact(compact: CompactGraph) -> ComputedGraph:
+    """
+    Compute a compact graph. Meant to be run in a worker thread or process.
+    """
+    return TaskGraph.from_compact(compact).computed()
+
+
+__all__ = [
+    "CompactGraph",
+    "ComputedGraph",
+    "TaskGraph",
+    "compute_compact",
+]
@@ -1,9 +1,18 @@
-from dataclasses import asdict as dc_asdict
-from dataclasses import fields as dc_fields
-from dataclasses import replace as dc_replace
-from typing import Any, Dict, Type, TypeVar
+from dataclasses import FrozenInstanceError
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    get_type_hints,
+)
 from uuid import UUID
 
+from pydantic import BaseConfig, BaseModel, Extra, create_model
 from pydantic import dataclasses as dc
 
 T = TypeVar("T", bound="Entity")
@@ -14,28 +23,169 @@ class DomainEvent:
     pass
 
 
-@dc.dataclass(frozen=True)
+class _ValidatorConfig(BaseConfig):
+    arbitrary_types_allowed = True
+    extra = Extra.forbid
+
+
 class Entity:
+    """
+    Base class of the immutable, slot-backed domain entities.
+
+    Subclasses declare their fields with __slots__ plus type annotations, and
+    their default values in _defaults. Values are validated (and coerced)
+    against the annotations once, when an entity is built at a boundary
+    (the constructor, or from_orm). The internal transitions made with
+    _replace skip validation and share any unchanged values, nested tuples
+    included, with the original.
+
+    Entities loaded from storage (with from_orm) also track which of their
+    fields have changed since, so that only those need to be written back.
+    """
+
+    __slots__ = ("id", "_changed")
     id: UUID
+    _changed: Optional[FrozenSet[str]]
+
+    _defaults: ClassVar[Dict[str, Any]] = {}
+    _fields: ClassVar[Tuple[str, ...]] = ("id",)
+    _validator: ClassVar[Optional[Type[BaseModel]]] = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        fields: Tuple[str, ...] = ()
+        defaults: Dict[str, Any] = {}
+        for klass in reversed(cls.__mro__):
+            fields += tuple(
+                name
+                for name in klass.__dict__.get("__slots__", ())
+                if not name.startswith("_")
+            )
+            defaults.update(klass.__dict__.get("_defaults", {}))
+        cls._fields = fields
+        cls._defaults = defaults
+        cls._validator = None
+
+    def __init__(self, **values: Any) -> None:
+        validated = self._validate(values)
+        for name in self._fields:
+            object.__setattr__(self, name, validated[name])
+        object.__setattr__(self, "_changed", None)
+
+    @classmethod
+    def _validate(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        if cls._validator is None:
+            hints = get_type_hints(cls)
+            cls._validator = create_model(  # type: ignore
+                f"{cls.__name__}Validator",
+                __config__=_ValidatorConfig,
+                **{
+                    name: (hints[name], cls._defaults.get(name, ...))
+                    for name in cls._fields
+                },
+            )
+        assert cls._validator is not None
+        return dict(cls._validator(**values))
+
+    @classmethod
+    def _construct(cls: Type[T], **values: Any) -> T:
+        """
+        Build an entity from already valid values, skipping validation
+        """
+        entity = object.__new__(cls)
+        for name in cls._fields:
+            object.__setattr__(
+                entity,
+                name,
+                values[name] if name in values else cls._defaults[name],
+            )
+        object.__setattr__(entity, "_changed", None)
+        return entity
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def _values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()  # type: ignore
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__name__}({values})"
 
     def to_raw(self) -> Dict[Any, Any]:
-        result = dc_asdict(self)
-        if "events" in result:
-            del result["events"]
-        return result
+        return {
+            name: _to_raw_value(getattr(self, name))
+            for name in self._fields
+            if name != "events"
+        }
+
+    @property
+    def changed_fields(self) -> Optional[FrozenSet[str]]:
+        """
+        The names of the fields changed since the entity was loaded from
+        storage, or None if it was not, in which case all of it is new
+        """
+        return self._changed
+
+    def _as_persisted(self: T) -> T:
+        """
+        Return the entity, marked as being the same as its stored version
+        """
+        if self._changed == frozenset():
+            return self
+        entity = self._replace()
+        object.__setattr__(entity, "_changed", frozenset())
+        return entity
 
     @classmethod
     def from_orm(cls: Type[T], orm: Any) -> T:
-        fields = dc_fields(cls)
         constr_dict = {
-            field.name: getattr(orm, field.name)
-            for field in fields
-            if hasattr(orm, field.name)
+            name: getattr(orm, name) for name in cls._fields if hasattr(orm, name)
         }
-        return cls(**constr_dict)
+        return cls(**constr_dict)._as_persisted()
 
     def _replace(self: T, **params: Any) -> T:
         """
         Create a new Entity with the parameters replaced
         """
-        return dc_replace(self, **params)
+        unknown = params.keys() - self._fields
+        if unknown:
+            raise TypeError(f"Unknown fields: {sorted(unknown)}")
+        entity = object.__new__(self.__class__)
+        for name in self._fields:
+            object.__setattr__(
+                entity,
+                name,
+                params[name] if name in params else getattr(self, name),
+            )
+
+        changed = self._changed
+        if changed is not None:
+            newly_changed = [
+                name
+                for name, value in params.items()
+                if name not in changed and value != getattr(self, name)
+            ]
+            if newly_changed:
+                changed = changed.union(newly_changed)
+        object.__setattr__(entity, "_changed", changed)
+        return entity
+
+
+def _to_raw_value(value: Any) -> Any:
+    if isinstance(value, Entity):
+        return value.to_raw()
+    if isinstance(value, tuple):
+        return tuple(_to_raw_value(v) for v in value)
+    return value
@@ -0,0 +1,60 @@
+"""
+Export every task and dependency edge, without going through the API:
+
+    python -m whatdo2.entrypoints.export > tasks.ndjson
+    python -m whatdo2.entrypoints.export --format parquet --output export/
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from whatdo2.adapters.database import dispose_engine
+from whatdo2.service_layer.task_export_service import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    TaskExportService,
+)
+
+
+async def _export(export_format: str, output: Optional[Path], chunk_size: int) -> None:
+    export_service = TaskExportService(chunk_size=chunk_size)
+    try:
+        if export_format == "parquet":
+            assert output is not None
+            await export_service.write_parquet(output)
+            return
+
+        if output is None:
+            async for chunk in export_service.stream_ndjson():
+                sys.stdout.buffer.write(chunk)
+            return
+        with open(output, "wb") as file:
+            async for chunk in export_service.stream_ndjson():
+                file.write(chunk)
+    finally:
+        await dispose_engine()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Export every task and dependency edge"
+    )
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="the file to write JSON lines to (standard output by default), "
+        "or the directory to write Parquet files to",
+    )
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and args.output is None:
+        parser.error("--output is needed for the parquet format")
+
+    asyncio.run(_export(args.format, args.output, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
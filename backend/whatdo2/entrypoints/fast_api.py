@@ -1,23 +1,143 @@
 import asyncio
 import logging
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Sequence
 from uuid import UUID
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic.main import BaseModel
+from sqlalchemy.orm import configure_mappers
 
-from whatdo2.domain.task.core import TaskType
-from whatdo2.domain.task.events import TaskActivated, TaskDeactivated, TaskEvent
+from whatdo2.adapters.database import (
+    PoolStats,
+    dispose_engine,
+    pool_stats,
+    warm_up_pool,
+)
+from whatdo2.config import (
+    ACTIVATION_RESYNC_INTERVAL,
+    ACTIVATION_RETRY_DELAY,
+    DB_POOL_WARM_CONNECTIONS,
+    NEXT_TASK_INDEX_MAX_AGE,
+    STARTUP_RETRY_DELAY,
+    TASK_FEED_COALESCE_DELAY,
+    TASK_FEED_HISTORY,
+    TASK_FEED_KEEPALIVE,
+    TASK_FEED_MAX_PENDING,
+    TASK_LIST_CACHE_SIZE,
+    TASK_LIST_CACHE_TTL,
+    TASK_LIST_STREAM_THRESHOLD,
+)
+from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.domain.task.events import (
+    TaskActivated,
+    TaskActivationScheduled,
+    TaskCreated,
+    TaskDeactivated,
+    TaskDependentsChanged,
+    TaskEvent,
+    TaskRankChanged,
+)
+from whatdo2.entrypoints.startup import Startup
+from whatdo2.metrics import CONTENT_TYPE, REGISTRY, Samples
+from whatdo2.service_layer.activation_scheduler import (
+    ActivationScheduler,
+    SchedulerStats,
+)
 from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.graph_executor import GraphExecutor
+from whatdo2.service_layer.json_encoding import dumps
+from whatdo2.service_layer.next_task_index import NextTaskIndex
 from whatdo2.service_layer.task_command_service import TaskCommandService
-from whatdo2.service_layer.task_query_service import TaskDTO, TaskQueryService
+from whatdo2.service_layer.task_export_service import TaskExportService
+from whatdo2.service_layer.task_feed import FEED_EVENT_TYPES, TaskFeed
+from whatdo2.service_layer.task_import_service import (
+    ImportReport,
+    InvalidImportError,
+    TaskImportService,
+)
+from whatdo2.service_layer.task_list_cache import TaskListCache
+from whatdo2.service_layer.task_query_service import (
+    InvalidCursorError,
+    TaskDTO,
+    TaskQueryService,
+)
+from whatdo2.service_layer.task_records import iter_lines
 from whatdo2.service_layer.unit_of_work import new_uow
 
 app = FastAPI()
 eventbus = EventBus()
-command_service = TaskCommandService(uow_factory=lambda: new_uow(eventbus))
+graph_executor = GraphExecutor()
+command_service = TaskCommandService(
+    uow_factory=lambda: new_uow(eventbus),
+    graph_executor=graph_executor,
+)
 query_service = TaskQueryService()
+export_service = TaskExportService()
+import_service = TaskImportService(
+    uow_factory=lambda: new_uow(eventbus),
+    graph_executor=graph_executor,
+)
+task_list_cache = TaskListCache(
+    max_entries=TASK_LIST_CACHE_SIZE,
+    ttl=TASK_LIST_CACHE_TTL,
+)
+next_task_index = NextTaskIndex(
+    load=query_service.list_task_ranks,
+    max_age=NEXT_TASK_INDEX_MAX_AGE,
+)
+task_feed = TaskFeed(
+    max_pending=TASK_FEED_MAX_PENDING,
+    history=TASK_FEED_HISTORY,
+    coalesce_delay=TASK_FEED_COALESCE_DELAY,
+    keepalive=TASK_FEED_KEEPALIVE,
+)
+activation_scheduler = ActivationScheduler(
+    activate=command_service.activate_ready_tasks,
+    load_schedule=query_service.list_scheduled_activations,
+    resync_interval=ACTIVATION_RESYNC_INTERVAL,
+    retry_delay=ACTIVATION_RETRY_DELAY,
+)
+
+
+def _pool_connections() -> Samples:
+    stats = pool_stats()
+    return [
+        (("checked_in",), stats.checked_in),
+        (("checked_out",), stats.checked_out),
+    ]
+
+
+REGISTRY.collect(
+    "whatdo2_db_pool_connections",
+    "Connections of the database pool, by state",
+    _pool_connections,
+    ["state"],
+)
+REGISTRY.collect(
+    "whatdo2_db_pool_size",
+    "Connections kept open by the database pool",
+    lambda: [((), pool_stats().size)],
+)
+REGISTRY.collect(
+    "whatdo2_db_pool_checkouts_total",
+    "Connections checked out of the database pool",
+    lambda: [((), pool_stats().checkouts)],
+    kind="counter",
+)
+REGISTRY.collect(
+    "whatdo2_db_pool_checkout_wait_seconds_total",
+    "Time spent waiting on the database pool for a connection",
+    lambda: [((), pool_stats().checkout_wait_total)],
+    kind="counter",
+)
+REGISTRY.collect(
+    "whatdo2_activation_pending",
+    "Task activations scheduled",
+    lambda: [((), activation_scheduler.stats().pending)],
+)
 
 ACTIVATION_BACKGROUND_TASK = None
 logger = logging.getLogger(__name__)
@@ -35,17 +155,87 @@ class DependentTaskPayload(BaseModel):
     id: UUID
 
 
-class TaskListReponse(BaseModel):
+class TaskResponse(BaseModel):
+    task: TaskDTO
+
+
+class NextTasksResponse(BaseModel):
     tasks: List[TaskDTO]
 
 
-class TaskResponse(BaseModel):
-    task: TaskDTO
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    candidates = {t.strip().replace("W/", "", 1) for t in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
 
 
 @app.get("/tasks")
-async def task_list() -> TaskListReponse:
-    return TaskListReponse(tasks=await query_service.list_tasks())
+async def task_list(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    task_type: Optional[TaskType] = None,
+    is_active: Optional[bool] = None,
+    min_effective_density: Optional[float] = None,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    try:
+        chunks = query_service.stream_tasks_json(
+            limit=limit,
+            cursor=cursor,
+            task_type=task_type,
+            is_active=is_active,
+            min_effective_density=min_effective_density,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit > TASK_LIST_STREAM_THRESHOLD:
+        return StreamingResponse(chunks, media_type="application/json")
+
+    async def _load() -> bytes:
+        return b"".join([chunk async for chunk in chunks])
+
+    cached = await task_list_cache.get_or_load(
+        (limit, cursor, task_type, is_active, min_effective_density),
+        _load,
+    )
+
+    headers = {"ETag": cached.etag}
+    if _etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+@app.get("/tasks/next")
+async def next_tasks(
+    n: int = Query(1, ge=1, le=100),
+    task_type: Optional[TaskType] = None,
+) -> NextTasksResponse:
+    task_ids = next_task_index.top(n, task_type.value if task_type else None)
+    if task_ids is None:
+        next_task_index.refresh_soon()
+        tasks = await query_service.list_next_tasks(n, task_type)
+    else:
+        tasks = await query_service.get_tasks(task_ids)
+    return NextTasksResponse(tasks=tasks)
+
+
+@app.get("/tasks/updates")
+async def task_updates(last_event_id: Optional[str] = Header(None)) -> Response:
+    """
+    Server-sent events with the changes to the tasks, to keep a fetched task
+    list current. A reset event means the list is to be fetched again.
+    """
+    return StreamingResponse(
+        task_feed.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/tasks")
@@ -60,6 +250,22 @@ async def create_task(task: TaskCreationPayload) -> TaskResponse:
     return TaskResponse(task=TaskDTO.from_orm(result))
 
 
+@app.get("/tasks/export")
+async def export_tasks() -> Response:
+    return StreamingResponse(
+        export_service.stream_ndjson(),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/tasks/import")
+async def import_tasks(request: Request) -> ImportReport:
+    try:
+        return await import_service.import_tasks(iter_lines(request.stream()))
+    except InvalidImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/task/{task_id}/dependent_tasks")
 async def add_dependent_task(
     task_id: UUID,
@@ -72,37 +278,130 @@ async def add_dependent_task(
     return TaskResponse(task=TaskDTO.from_orm(result))
 
 
-async def run_activate_ready_task_loop() -> None:
-    """
-    Main background task loop
-    """
-    while True:
-        try:
-            logger.debug("Activating inactive ready tasks")
-            await command_service.activate_ready_tasks()
-        except Exception:
-            logger.exception("An error occurred during background task:")
+@app.get("/stats/pool")
+async def database_pool_stats() -> PoolStats:
+    return pool_stats()
 
-        await asyncio.sleep(10)
+
+@app.get("/stats/activation_scheduler")
+async def activation_scheduler_stats() -> SchedulerStats:
+    return activation_scheduler.stats()
 
 
 @app.on_event("startup")
 async def register_event_handlers() -> None:
-    async def _handle(event: TaskEvent) -> None:
-        await command_service.update_is_active_for_prerequisite_tasks(event.task_id)
+    async def _handle(events: Sequence[TaskEvent]) -> None:
+        # The activation sweep recomputes every ancestor of the tasks that it
+        # activates, in the same unit of work, so they are not updated again
+        task_ids = [
+            event.task_id
+            for event in events
+            if not (isinstance(event, TaskActivated) and event.prerequisites_updated)
+        ]
+        if task_ids:
+            await command_service.update_is_active_for_prerequisite_tasks(task_ids)
+
+    async def _schedule(event: TaskActivationScheduled) -> None:
+        activation_scheduler.schedule(event.task_id, event.activation_time)
+
+    eventbus.register_batch(
+        (TaskCreated, TaskActivated, TaskDeactivated, TaskDependentsChanged),
+        task_list_cache.handle_events,
+    )
+    eventbus.register_batch((TaskActivated, TaskDeactivated), _handle)
+    eventbus.register(TaskActivationScheduled, _schedule)
+    eventbus.register_batch(TaskRankChanged, next_task_index.handle_events)
+    eventbus.register_batch(FEED_EVENT_TYPES, task_feed.handle_events)
+
+
+async def _configure_mappers() -> None:
+    configure_mappers()
+
+
+async def _warm_up_serializers() -> None:
+    """
+    Build the validators of the domain entities, and go through the
+    encodings of a task once
+    """
+    dependent, task = (
+        Task.new(
+            name="warm up",
+            importance=1,
+            time=1,
+            task_type=TaskType.HOME,
+            activation_time=datetime.utcnow(),
+            is_active=True,
+        )
+        for _ in range(2)
+    )
+    task = Task.from_orm(task.add_dependent_tasks([dependent]))
+    response = TaskResponse(task=TaskDTO.from_orm(task))
+    response.json()
+    dumps(response.dict())
+
+
+async def _warm_up_pool() -> None:
+    await warm_up_pool(DB_POOL_WARM_CONNECTIONS)
+
+
+startup = Startup(
+    [
+        ("configure_mappers", _configure_mappers),
+        ("serializers", _warm_up_serializers),
+        ("connection_pool", _warm_up_pool),
+        ("graph_executor", graph_executor.warm_up),
+        ("next_task_index", next_task_index.refresh),
+    ],
+    retry_delay=STARTUP_RETRY_DELAY,
+)
 
-    eventbus.register(TaskActivated, _handle)
-    eventbus.register(TaskDeactivated, _handle)
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
+
+@app.get("/health/live")
+async def liveness() -> Response:
+    return Response(status_code=204)
+
+
+@app.get("/health/ready")
+async def readiness() -> Response:
+    report = startup.report()
+    return JSONResponse(
+        content=jsonable_encoder(report),
+        status_code=200 if report.ready else 503,
+    )
+
+
+async def _start_up() -> None:
+    await startup.run()
+    # The sweeps only start once warm, so that they do not compete with the
+    # warm-up for connections
+    await activation_scheduler.run()
 
 
 @app.on_event("startup")
 async def start_regular_task_activation_task() -> None:
     loop = asyncio.get_running_loop()
     global ACTIVATION_BACKGROUND_TASK
-    ACTIVATION_BACKGROUND_TASK = loop.create_task(run_activate_ready_task_loop())
+    ACTIVATION_BACKGROUND_TASK = loop.create_task(_start_up())
 
 
 @app.on_event("shutdown")
 async def stop_regular_task_activation_task() -> None:
     if ACTIVATION_BACKGROUND_TASK:
         ACTIVATION_BACKGROUND_TASK.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_graph_executor() -> None:
+    graph_executor.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_database_engine() -> None:
+    await dispose_engine()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Phase = Tuple[str, Callable[[], Awaitable[None]]]
+
+
+@dataclass(frozen=True)
+class StartupReport:
+    ready: bool
+    # Seconds taken by each phase that has run, in order
+    phases: Dict[str, float]
+    # The phase being retried after a failure, if any
+    failing_phase: Optional[str]
+
+
+class Startup:
+    """
+    Runs the startup phases of the app in order, timing each of them.
+
+    The app is only ready once every phase has succeeded. A failed phase is
+    logged and retried every retry_delay seconds, and the app stays up but
+    not ready in the meantime.
+    """
+
+    def __init__(self, phases: Sequence[Phase], retry_delay: float) -> None:
+        self._phases = list(phases)
+        self._retry_delay = retry_delay
+        self._timings: List[Tuple[str, float]] = []
+        self._failing_phase: Optional[str] = None
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def report(self) -> StartupReport:
+        return StartupReport(
+            ready=self._ready,
+            phases=dict(self._timings),
+            failing_phase=self._failing_phase,
+        )
+
+    async def run(self) -> None:
+        for name, phase in self._phases:
+            seconds = await self._run_phase(name, phase)
+            self._timings.append((name, seconds))
+            logger.info("Startup phase %s took %.1f ms", name, seconds * 1000)
+
+        self._ready = True
+        logger.info(
+            "Ready after %.1f ms",
+            sum(seconds for _, seconds in self._timings) * 1000,
+        )
+
+    async def _run_phase(
+        self, name: str, phase: Callable[[], Awaitable[None]]
+    ) -> float:
+        while True:
+            started = time.perf_counter()
+            try:
+                await phase()
+            except Exception:
+                logger.exception("Startup phase %s failed:", name)
+                self._failing_phase = name
+                await asyncio.sleep(self._retry_delay)
+                continue
+            self._failing_phase = None
+            return time.perf_counter() - started
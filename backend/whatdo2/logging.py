@@ -1,5 +1,7 @@
 import logging.config
 
+from whatdo2.config import LOG_LEVEL
+
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": True,
@@ -8,7 +10,7 @@ LOGGING_CONFIG = {
     },
     "handlers": {
         "default": {
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
             "formatter": "standard",
             "class": "logging.StreamHandler",
         },
@@ -16,7 +18,7 @@ LOGGING_CONFIG = {
     "loggers": {
         "": {  # root logger
             "handlers": ["default"],
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
             "propagate": False,
         },
     },
@@ -0,0 +1,238 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from whatdo2.config import METRICS_ENABLED
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+# Values of a metric, by the values of its labels
+Samples = Iterable[Tuple[Sequence[str], float]]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    """
+    Counts observations into buckets, per set of label values. Nothing is
+    recorded while the registry is disabled.
+    """
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = SECONDS_BUCKETS,
+    ) -> None:
+        self._registry = registry
+        self.name = name
+        self._help = help
+        self._labelnames = tuple(labelnames)
+        self._buckets = tuple(buckets)
+        # The count of each bucket, not yet cumulative, then the +Inf one,
+        # and the sum of the observations
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if not self._registry.enabled:
+            return
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = ([0] * (len(self._buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self._buckets, value)] += 1
+        total[0] += value
+
+    def time(self, *labelvalues: str) -> ContextManager[None]:
+        """
+        Observe the seconds spent in the with block
+        """
+        if not self._registry.enabled:
+            return nullcontext()
+        return self._timing(labelvalues)
+
+    @contextmanager
+    def _timing(self, labelvalues: Tuple[str, ...]) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def timed(self, fn: F) -> F:
+        """
+        Decorate a coroutine function to observe the seconds of every call,
+        labelled with its name. While the registry is disabled, the function
+        is returned as it is, so that it costs nothing.
+        """
+        if not self._registry.enabled:
+            return fn
+        name = fn.__name__
+
+        @wraps(fn)
+        async def _timed(*args: Any, **kwargs: Any) -> Any:
+            with self._timing((name,)):
+                return await fn(*args, **kwargs)
+
+        return cast(F, _timed)
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self._help}"
+        yield f"# TYPE {self.name} histogram"
+        for labelvalues, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self._buckets, float("inf")), counts):
+                cumulative += count
+                labels = _labels(self._labelnames, labelvalues, le=_number(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self._labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_number(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Collected:
+    """
+    A gauge or counter whose values are read from elsewhere when exposed
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Samples],
+    ) -> None:
+        self.name = name
+        self._help = help
+        self._kind = kind
+        self._labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self._help}"
+        yield f"# TYPE {self.name} {self._kind}"
+        for labelvalues, value in self._collect():
+            labels = _labels(self._labelnames, labelvalues)
+            yield f"{self.name}{labels} {_number(value)}"
+
+
+class Registry:
+    """
+    The metrics of the process, exposed in the Prometheus text format
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = SECONDS_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(self, name, help, labelnames, buckets)
+        self._metrics[name] = histogram
+        return histogram
+
+    def collect(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Samples],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ) -> None:
+        """
+        Register a gauge or counter, whose values are read with collect
+        whenever the metrics are exposed
+        """
+        self._metrics[name] = _Collected(name, help, kind, labelnames, collect)
+
+    def expose(self) -> str:
+        lines = [line for metric in self._metrics.values() for line in metric.expose()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(enabled=METRICS_ENABLED)
+
+COMMAND_SECONDS = REGISTRY.histogram(
+    "whatdo2_command_seconds",
+    "Time taken by the task commands, retries included",
+    ["command"],
+)
+REPOSITORY_SECONDS = REGISTRY.histogram(
+    "whatdo2_repository_seconds",
+    "Time taken by the queries of the task repository",
+    ["method"],
+)
+EVENTBUS_FAN_OUT = REGISTRY.histogram(
+    "whatdo2_eventbus_dispatch_handlers",
+    "Handler calls made by each dispatch of the event bus",
+    buckets=COUNT_BUCKETS,
+)
+EVENT_HANDLER_SECONDS = REGISTRY.histogram(
+    "whatdo2_eventbus_handler_seconds",
+    "Time taken by each call of an event handler",
+    ["handler"],
+)
+ACTIVATION_LAG_SECONDS = REGISTRY.histogram(
+    "whatdo2_activation_lag_seconds",
+    "Time between the earliest due activation and the sweep activating it",
+)
+ACTIVATION_BATCH_SIZE = REGISTRY.histogram(
+    "whatdo2_activation_batch_size",
+    "Tasks activated by each sweep",
+    buckets=COUNT_BUCKETS,
+)
@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from whatdo2.metrics import ACTIVATION_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    pending: int
+    next_fire_time: Optional[datetime]
+    last_fired_at: Optional[datetime]
+    last_lag: Optional[float]
+    max_lag: float
+    fired: int
+    resyncs: int
+
+
+class ActivationScheduler:
+    """
+    Activate tasks when they become due, instead of polling for them.
+
+    Pending activation times are kept in a min-heap, and the scheduler sleeps
+    until the earliest of them (or until an earlier one is scheduled). As a
+    safety net, every resync_interval seconds it runs a sweep regardless and
+    reloads the heap from the database.
+    """
+
+    def __init__(
+        self,
+        activate: Callable[[], Awaitable[None]],
+        load_schedule: Callable[[], Awaitable[Iterable[Tuple[UUID, datetime]]]],
+        resync_interval: float,
+        retry_delay: float,
+    ) -> None:
+        self._activate = activate
+        self._load_schedule = load_schedule
+        self._resync_interval = resync_interval
+        self._retry_delay = retry_delay
+
+        self._heap: List[Tuple[datetime, UUID]] = []
+        # The latest activation time of each scheduled task. Heap entries that
+        # disagree with it are stale and are skipped when popped.
+        self._scheduled: Dict[UUID, datetime] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_resync: Optional[float] = None
+
+        self._last_fired_at: Optional[datetime] = None
+        self._last_lag: Optional[float] = None
+        self._max_lag = 0.0
+        self._fired = 0
+        self._resyncs = 0
+
+    @property
+    def next_fire_time(self) -> Optional[datetime]:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def stats(self) -> SchedulerStats:
+        return SchedulerStats(
+            pending=len(self._scheduled),
+            next_fire_time=self.next_fire_time,
+            last_fired_at=self._last_fired_at,
+            last_lag=self._last_lag,
+            max_lag=self._max_lag,
+            fired=self._fired,
+            resyncs=self._resyncs,
+        )
+
+    def schedule(self, task_id: UUID, activation_time: datetime) -> None:
+        """
+        Schedule (or reschedule) the activation of a task
+        """
+        activation_time = activation_time.replace(tzinfo=None)
+        next_fire_time = self.next_fire_time
+
+        self._scheduled[task_id] = activation_time
+        heapq.heappush(self._heap, (activation_time, task_id))
+
+        if self._wakeup and (
+            next_fire_time is None or activation_time < next_fire_time
+        ):
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """
+        Main background task loop
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await self._run_once()
+            except Exception:
+                logger.exception("An error occurred during background task:")
+                await asyncio.sleep(self._retry_delay)
+
+    async def _run_once(self) -> None:
+        if (
+            self._last_resync is None
+            or time.monotonic() - self._last_resync >= self._resync_interval
+        ):
+            await self._resync()
+
+        delay = self._seconds_until_next_wakeup()
+        if delay > 0:
+            await self._sleep(delay)
+            return
+
+        await self._fire_due()
+
+    async def _resync(self) -> None:
+        logger.debug("Resyncing activation schedule")
+        await self._activate()
+        schedule = await self._load_schedule()
+
+        self._scheduled = {
+            task_id: activation_time.replace(tzinfo=None)
+            for task_id, activation_time in schedule
+        }
+        self._heap = [(at, task_id) for task_id, at in self._scheduled.items()]
+        heapq.heapify(self._heap)
+        self._last_resync = time.monotonic()
+        self._resyncs += 1
+
+    def _seconds_until_next_wakeup(self) -> float:
+        assert self._last_resync is not None
+        until_resync = self._last_resync + self._resync_interval - time.monotonic()
+
+        next_fire_time = self.next_fire_time
+        if next_fire_time is None:
+            return until_resync
+
+        until_due = (next_fire_time - datetime.utcnow()).total_seconds()
+        return min(until_due, until_resync)
+
+    async def _sleep(self, delay: float) -> None:
+        assert self._wakeup is not None
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _fire_due(self) -> None:
+        now = datetime.utcnow()
+        earliest = self.next_fire_time
+        if earliest is None or earliest > now:
+            return
+
+        # One sweep activates everything that is due, not just the earliest.
+        # The entries are only dropped once it has succeeded.
+        await self._activate()
+        while self._heap and self._heap[0][0] <= now:
+            activation_time, task_id = heapq.heappop(self._heap)
+            if self._scheduled.get(task_id) == activation_time:
+                del self._scheduled[task_id]
+
+        self._last_fired_at = now
+        self._last_lag = (now - earliest).total_seconds()
+        self._max_lag = max(self._max_lag, self._last_lag)
+        ACTIVATION_LAG_SECONDS.observe(self._last_lag)
+        self._fired += 1
+
+    def _discard_stale(self) -> None:
+        while self._heap:
+            activation_time, task_id = self._heap[0]
+            if self._scheduled.get(task_id) == activation_time:
+                return
+            heapq.heappop(self._heap)
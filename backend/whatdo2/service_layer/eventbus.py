@@ -1,23 +1,98 @@
+import asyncio
 from collections import defaultdict
-from typing import Any, Awaitable, Callable, Dict, Iterable, List, Type, TypeVar
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from whatdo2.config import EVENTBUS_MAX_CONCURRENCY
 from whatdo2.domain.typedefs import DomainEvent
+from whatdo2.metrics import EVENT_HANDLER_SECONDS, EVENTBUS_FAN_OUT
 
 T = TypeVar("T", bound=DomainEvent)
 
+Handler = Callable[[Any], Awaitable[Any]]
+BatchHandler = Callable[[Sequence[Any]], Awaitable[Any]]
+
+
+def _name(handler: Callable[..., Any]) -> str:
+    name = getattr(handler, "__qualname__", repr(handler))
+    return str(name).replace(".<locals>", "")
+
 
 class EventBus:
-    def __init__(self) -> None:
-        self._handlers: Dict[
-            Type[DomainEvent], List[Callable[[Any], Awaitable[Any]]]
-        ] = defaultdict(list)
+    """
+    Dispatches domain events to the handlers registered for their type.
+
+    Each dispatch first merges duplicate events. A handler registered with
+    register is awaited once per event, in order; a handler registered with
+    register_batch is awaited once with all of the events of its types. The
+    handlers themselves are assumed to be independent of each other, and run
+    concurrently, at most max_concurrency at a time.
+    """
+
+    def __init__(self, max_concurrency: int = EVENTBUS_MAX_CONCURRENCY) -> None:
+        self._handlers: Dict[Type[DomainEvent], List[Handler]] = defaultdict(list)
+        self._batch_handlers: List[
+            Tuple[Tuple[Type[DomainEvent], ...], BatchHandler]
+        ] = []
+        self._max_concurrency = max_concurrency
 
     def register(
         self, event_type: Type[T], handler: Callable[[T], Awaitable[Any]]
     ) -> None:
         self._handlers[event_type].append(handler)
 
+    def register_batch(
+        self,
+        event_types: Union[Type[T], Tuple[Type[T], ...]],
+        handler: Callable[[Sequence[T]], Awaitable[Any]],
+    ) -> None:
+        if not isinstance(event_types, tuple):
+            event_types = (event_types,)
+        self._batch_handlers.append((event_types, handler))
+
     async def dispatch(self, events: Iterable[DomainEvent]) -> None:
-        for event in events:
+        unique_events = list(dict.fromkeys(events))
+
+        per_handler: Dict[Handler, List[DomainEvent]] = defaultdict(list)
+        for event in unique_events:
             for handler in self._handlers[type(event)]:
-                await handler(event)
+                per_handler[handler].append(event)
+
+        calls: List[Tuple[str, Awaitable[Any]]] = [
+            (_name(handler), self._call_each(handler, handler_events))
+            for handler, handler_events in per_handler.items()
+        ]
+        for event_types, batch_handler in self._batch_handlers:
+            batch = [e for e in unique_events if type(e) in event_types]
+            if batch:
+                calls.append((_name(batch_handler), batch_handler(batch)))
+
+        EVENTBUS_FAN_OUT.observe(len(calls))
+        if not calls:
+            return
+
+        # Per dispatch, as handlers dispatch events of their own and must not
+        # wait on permits held by their callers
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def _bounded(name: str, call: Awaitable[Any]) -> None:
+            async with semaphore:
+                with EVENT_HANDLER_SECONDS.time(name):
+                    await call
+
+        await asyncio.gather(*(_bounded(name, call) for name, call in calls))
+
+    async def _call_each(self, handler: Handler, events: List[DomainEvent]) -> None:
+        for event in events:
+            await handler(event)
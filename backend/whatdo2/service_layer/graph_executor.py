@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+from whatdo2.config import (
+    GRAPH_ENGINE,
+    GRAPH_EXECUTOR,
+    GRAPH_EXECUTOR_MAX_WORKERS,
+    GRAPH_EXECUTOR_THRESHOLD,
+)
+from whatdo2.domain.task.core import Task
+from whatdo2.domain.task.graph import (
+    CompactGraph,
+    ComputedGraph,
+    TaskGraph,
+    compute_compact,
+)
+
+EXECUTOR_KINDS = ("process", "thread", "inline")
+ENGINES = ("object", "numpy")
+
+
+class GraphExecutor:
+    """
+    Computes task graphs, handing the large ones over to a pool so that they
+    do not stall the event loop.
+
+    Graphs with fewer than threshold tasks are computed inline, as shipping
+    them elsewhere would cost more than it saves. The others are sent to the
+    pool in their compact form, and only the computed values come back. A
+    process pool runs them in parallel with the event loop; a thread pool
+    still shares the GIL with it, but bounds how long it is held at a time.
+    Either way, they are computed by the given engine.
+    """
+
+    def __init__(
+        self,
+        kind: str = GRAPH_EXECUTOR,
+        threshold: int = GRAPH_EXECUTOR_THRESHOLD,
+        max_workers: int = GRAPH_EXECUTOR_MAX_WORKERS,
+        engine: str = GRAPH_ENGINE,
+    ) -> None:
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown graph executor {kind!r}")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown graph engine {engine!r}")
+        self._kind = kind
+        self._engine: Callable[[CompactGraph], ComputedGraph] = compute_compact
+        if engine == "numpy":
+            # Only imported when asked for, as importing numpy is slow
+            from whatdo2.domain.task.vectorized import (
+                NUMPY_AVAILABLE,
+                compute_vectorized,
+            )
+
+            if not NUMPY_AVAILABLE:
+                raise ValueError("The numpy graph engine needs numpy installed")
+            self._engine = compute_vectorized
+        self._threshold = threshold
+        self._max_workers = max_workers
+        self._executor: Optional[Executor] = None
+
+    async def compute(self, tasks: Sequence[Task]) -> ComputedGraph:
+        if len(tasks) < self._threshold:
+            return TaskGraph.from_tasks(tasks)
+
+        return await self.compute_compact(CompactGraph.from_tasks(tasks))
+
+    async def compute_compact(self, compact: CompactGraph) -> ComputedGraph:
+        if len(compact) < self._threshold or self._kind == "inline":
+            return self._engine(compact)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._engine, compact)
+
+    async def warm_up(self) -> None:
+        """
+        Start every worker of the pool and have it import the engine, rather
+        than leave that to the first large computation
+        """
+        empty = CompactGraph.from_tasks([])
+        if self._kind == "inline":
+            self._engine(empty)
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, self._engine, empty)
+                for _ in range(self._max_workers)
+            )
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers,
+                    # Forking a process with a running event loop and open
+                    # connections is not safe
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="graph-executor",
+                )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence
+from uuid import UUID
+
+from whatdo2.adapters.task_repository import TaskRepository
+from whatdo2.domain.task.core import Task
+
+# The fields that decide which tasks are to be done next
+_RANK_FIELDS = frozenset(("task_type", "is_active", "effective_density"))
+
+
+class IdentityMapTaskRepository(TaskRepository):
+    """
+    A TaskRepository that keeps the tasks of one unit of work by id, in front
+    of another repository.
+
+    Getting a task that was already loaded or saved within the unit of work
+    returns that version without a query. Saves are held back as pending
+    versions, one per task, and written with a single save_many when the unit
+    of work is flushed. Queries that select tasks by something other than
+    their id flush first, so that the underlying repository sees the pending
+    writes, and return the tasks of the map wherever it has them.
+    """
+
+    def __init__(self, repository: TaskRepository) -> None:
+        self._repository = repository
+        self._tasks: Dict[UUID, Task] = {}
+        self._pending: Dict[UUID, Task] = {}
+        # The latest written version of every task whose rank was changed
+        self._ranked: Dict[UUID, Task] = {}
+
+    def pop_ranked(self) -> List[Task]:
+        """
+        Return the tasks whose rank was written since the last call
+        """
+        ranked = list(self._ranked.values())
+        self._ranked = {}
+        return ranked
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending = list(self._pending.values())
+        self._pending = {}
+        stored = await self._repository.save_many(pending)
+        self._tasks.update((task.id, task) for task in stored)
+        for task in pending:
+            changed = task.changed_fields
+            if changed is None or changed & _RANK_FIELDS:
+                self._ranked[task.id] = self._tasks[task.id]
+
+    def _remember(self, tasks: Iterable[Task]) -> List[Task]:
+        return [self._tasks.setdefault(task.id, task) for task in tasks]
+
+    async def get(self, task_id: UUID) -> Task:
+        if task_id not in self._tasks:
+            self._tasks[task_id] = await self._repository.get(task_id)
+        return self._tasks[task_id]
+
+    async def get_many(self, task_ids: Iterable[UUID]) -> List[Task]:
+        ids = list(task_ids)
+        self._remember(
+            await self._repository.get_many([t for t in ids if t not in self._tasks])
+        )
+        return [self._tasks[t] for t in ids if t in self._tasks]
+
+    async def list_existing_ids(self, task_ids: Iterable[UUID]) -> List[UUID]:
+        ids = list(task_ids)
+        stored = set(
+            await self._repository.list_existing_ids(
+                [t for t in ids if t not in self._tasks]
+            )
+        )
+        return [t for t in ids if t in self._tasks or t in stored]
+
+    async def save(self, task: Task) -> None:
+        await self.save_many([task])
+
+    async def save_many(self, tasks: Sequence[Task]) -> List[Task]:
+        """
+        Hold the given tasks back until the next flush, and return them as
+        the unit of work now sees them.
+
+        The changed fields of a loaded task are applied to the latest version
+        of it in the map, so saving a task again, even after it was flushed,
+        keeps the earlier changes and the version that they were written at.
+        """
+        for task in tasks:
+            latest = self._pending.get(task.id, self._tasks.get(task.id))
+            changed = task.changed_fields
+            if latest is not None and changed is not None:
+                task = latest._replace(**{f: getattr(task, f) for f in changed})
+            self._pending[task.id] = task
+            # Changes made to the task from here on are tracked against the
+            # pending version, and merged into it when saved
+            self._tasks[task.id] = task._as_persisted()
+        return [self._tasks[task.id] for task in tasks]
+
+    async def delete(self, task_id: UUID) -> None:
+        await self.flush()
+        deleted = await self.get_many([task_id])
+        await self._repository.delete(task_id)
+        # Published as inactive, so that the task is taken out of the ranks
+        for task in deleted:
+            self._ranked[task_id] = task._replace(
+                is_active=False, effective_density=0.0
+            )
+        # Other tasks may have referred to the deleted one
+        self._tasks = {}
+
+    async def list_inactive_with_past_activation_times(self) -> List[Task]:
+        await self.flush()
+        return self._remember(
+            await self._repository.list_inactive_with_past_activation_times()
+        )
+
+    async def list_prerequisites_for_task(self, task_id: UUID) -> List[Task]:
+        await self.flush()
+        return self._remember(
+            await self._repository.list_prerequisites_for_task(task_id)
+        )
+
+    async def list_prerequisites_for_tasks(
+        self, task_ids: Iterable[UUID]
+    ) -> List[Task]:
+        await self.flush()
+        return self._remember(
+            await self._repository.list_prerequisites_for_tasks(task_ids)
+        )
+
+    async def list_ancestors(self, task_ids: Iterable[UUID]) -> List[Task]:
+        await self.flush()
+        return self._remember(await self._repository.list_ancestors(task_ids))
+
+    async def activate_due_tasks(self, current_time: datetime) -> List[Task]:
+        await self.flush()
+        activated = await self._repository.activate_due_tasks(current_time)
+        # These were changed in storage, so any versions held here are stale
+        self._tasks.update((task.id, task) for task in activated)
+        self._ranked.update((task.id, task) for task in activated)
+        return activated
@@ -0,0 +1,29 @@
+"""
+Encoding of trusted data (such as rows read from the database) straight to
+JSON, with orjson when it is installed
+"""
+import json
+from datetime import datetime
+from typing import Any, Callable
+from uuid import UUID
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} to JSON")
+
+
+def stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), default=_default).encode()
+
+
+dumps: Callable[[Any], bytes] = stdlib_dumps
+try:
+    import orjson
+
+    dumps = orjson.dumps
+except ImportError:  # pragma: no cover
+    pass
@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import logging
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from whatdo2.domain.task.events import TaskRankChanged
+
+logger = logging.getLogger(__name__)
+
+# Densest first, then by id like the task list
+_Key = Tuple[float, UUID]
+
+
+class NextTaskIndex:
+    """
+    An in-memory index of the active tasks of each type, densest first, to
+    pick the next tasks to do from without querying for them.
+
+    It is loaded from the database, and then kept up to date by the
+    TaskRankChanged events. Events are only seen by the process that ran the
+    command, so the index is also reloaded once it is older than max_age
+    seconds. Until then, top returns None, for the caller to fall back to
+    the database.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[Iterable[Tuple[UUID, str, float]]]],
+        max_age: float,
+    ) -> None:
+        self._load = load
+        self._max_age = max_age
+        self._keys: Dict[str, List[_Key]] = {}
+        self._entries: Dict[UUID, Tuple[str, _Key]] = {}
+        self._loaded_at: Optional[float] = None
+        # Events handled while loading, to apply again to the loaded index
+        self._replay: Optional[List[TaskRankChanged]] = None
+        self._refreshing: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at <= self._max_age
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def top(self, n: int, task_type: Optional[str] = None) -> Optional[List[UUID]]:
+        """
+        Return the ids of the n densest active tasks, of the given type if
+        any, or None if the index is not fresh
+        """
+        if not self.is_fresh:
+            return None
+        if task_type is not None:
+            keys: Iterable[_Key] = self._keys.get(task_type, [])
+        else:
+            keys = heapq.merge(*self._keys.values())
+        return [task_id for _, task_id in islice(keys, n)]
+
+    async def handle_events(self, events: Sequence[TaskRankChanged]) -> None:
+        for event in events:
+            self._apply(event)
+        if self._replay is not None:
+            self._replay.extend(events)
+
+    def _apply(self, event: TaskRankChanged) -> None:
+        entry = self._entries.pop(event.task_id, None)
+        if entry is not None:
+            task_type, key = entry
+            keys = self._keys[task_type]
+            del keys[bisect_left(keys, key)]
+        if event.is_active:
+            self._insert(event.task_id, event.task_type, event.effective_density)
+
+    def _insert(self, task_id: UUID, task_type: str, effective_density: float) -> None:
+        key = (-effective_density, task_id)
+        insort(self._keys.setdefault(task_type, []), key)
+        self._entries[task_id] = (task_type, key)
+
+    async def refresh(self) -> None:
+        """
+        Reload the index from the database
+        """
+        self._replay = []
+        try:
+            ranks = await self._load()
+            self._keys = {}
+            self._entries = {}
+            for task_id, task_type, effective_density in ranks:
+                self._entries[task_id] = (task_type, (-effective_density, task_id))
+            for task_id, (task_type, key) in self._entries.items():
+                self._keys.setdefault(task_type, []).append(key)
+            for keys in self._keys.values():
+                keys.sort()
+            for event in self._replay:
+                self._apply(event)
+        finally:
+            self._replay = None
+        self._loaded_at = time.monotonic()
+
+    def refresh_soon(self) -> None:
+        """
+        Start reloading the index in the background, unless it already is
+        """
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.get_running_loop().create_task(
+                self._refresh_logging_errors()
+            )
+
+    async def _refresh_logging_errors(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Reloading the next task index failed:")
@@ -1,39 +1,91 @@
 import logging
 from datetime import datetime
-from typing import AsyncContextManager, Callable, List
+from typing import (
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 from uuid import UUID
 
+from whatdo2.adapters.task_repository import ConcurrentUpdateError
+from whatdo2.config import COMMAND_MAX_ATTEMPTS
 from whatdo2.domain.task.core import Task, TaskType
+from whatdo2.domain.task.events import (
+    TaskActivated,
+    TaskActivationScheduled,
+    TaskCreated,
+    TaskDependentsChanged,
+)
+from whatdo2.metrics import ACTIVATION_BATCH_SIZE, COMMAND_SECONDS
+from whatdo2.service_layer.graph_executor import GraphExecutor
 from whatdo2.service_layer.unit_of_work import UnitOfWork
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class TaskCommandService:
     def __init__(
-        self, uow_factory: Callable[[], AsyncContextManager[UnitOfWork]]
+        self,
+        uow_factory: Callable[[], AsyncContextManager[UnitOfWork]],
+        graph_executor: Optional[GraphExecutor] = None,
+        max_attempts: int = COMMAND_MAX_ATTEMPTS,
     ) -> None:
         self._uow_factory = uow_factory
+        self._graph_executor = graph_executor or GraphExecutor()
+        self._max_attempts = max_attempts
 
-    async def update_is_active_for_prerequisite_tasks(self, task_id: UUID) -> None:
-        async with self._uow_factory() as uow:
-            tasks = await uow.task_repository.list_prerequisites_for_task(
-                task_id,
-            )
-            await self._multiple_update_is_active(uow, tasks)
+    async def _retrying(self, command: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a command, in a unit of work of its own, again from the start
+        whenever its tasks were changed concurrently
+        """
+        for attempt in range(1, self._max_attempts):
+            try:
+                return await command()
+            except ConcurrentUpdateError as e:
+                logger.info("Retrying after attempt %d: %s", attempt, e)
+        return await command()
+
+    @COMMAND_SECONDS.timed
+    async def update_is_active_for_prerequisite_tasks(
+        self, task_ids: Sequence[UUID]
+    ) -> None:
+        """
+        Update the prerequisites of all of the given tasks at once, in a
+        single unit of work
+        """
+
+        async def _update() -> None:
+            async with self._uow_factory() as uow:
+                tasks = await uow.task_repository.list_prerequisites_for_tasks(
+                    dict.fromkeys(task_ids),
+                )
+                await self._multiple_update_is_active(uow, tasks)
+
+        await self._retrying(_update)
 
     async def _multiple_update_is_active(
         self, uow: UnitOfWork, tasks: List[Task]
     ) -> None:
-        logger.debug(
-            "Calling update_is_active on the following tasks: %s",
-            [t.id for t in tasks],
-        )
-        for task in tasks:
-            task = task.update_is_active(datetime.utcnow())
-            await uow.task_repository.save(task)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Calling update_is_active on the following tasks: %s",
+                [t.id for t in tasks],
+            )
+        current_time = datetime.utcnow()
+        updated = [task.update_is_active(current_time) for task in tasks]
+        await uow.task_repository.save_many(updated)
+        for task in updated:
             uow.push_events(task.events)
 
+    @COMMAND_SECONDS.timed
     async def create_task(
         self,
         name: str,
@@ -52,18 +104,72 @@ class TaskCommandService:
                 is_active=True,
             ).update_is_active(current_time=datetime.utcnow())
             await uow.task_repository.save(new_task)
+            uow.push_events([TaskCreated(new_task.id)])
+            if not new_task.is_active:
+                uow.push_events(
+                    [TaskActivationScheduled(new_task.id, new_task.activation_time)]
+                )
             return new_task
 
+    @COMMAND_SECONDS.timed
     async def add_dependent_task(self, task_id: UUID, dependent_task_id: UUID) -> Task:
-        async with self._uow_factory() as uow:
-            t1 = await uow.task_repository.get(task_id=task_id)
-            t2 = await uow.task_repository.get(task_id=dependent_task_id)
+        """
+        Add the edge, and recompute the prerequisite and every one of its
+        ancestors in the same unit of work
+        """
+
+        async def _add() -> Task:
+            async with self._uow_factory() as uow:
+                t1 = await uow.task_repository.get(task_id=task_id)
+                t2 = await uow.task_repository.get(task_id=dependent_task_id)
+
+                # Checks for cycles, and gives the prerequisite its new dependent
+                added = t1.add_dependent_tasks([t2])
+                tasks = await self._list_with_ancestors(uow, [added])
+                graph = await self._graph_executor.compute(tasks)
+                # Only the tasks whose computed values changed are written back
+                await uow.task_repository.save_many([graph.apply(t) for t in tasks])
+                uow.push_events([TaskDependentsChanged(added.id)])
+                return graph.apply(added)
 
-            result = t1.add_dependent_tasks([t2])
-            await uow.task_repository.save(result)
-            return result
+        return await self._retrying(_add)
+
+    async def _list_with_ancestors(
+        self, uow: UnitOfWork, tasks: List[Task]
+    ) -> List[Task]:
+        """
+        Return the given tasks along with all of their transitive
+        prerequisites
+        """
+        loaded: Dict[UUID, Task] = {t.id: t for t in tasks}
+        ancestors = await uow.task_repository.list_ancestors(loaded)
+        loaded.update((a.id, a) for a in ancestors if a.id not in loaded)
+        return list(loaded.values())
 
+    @COMMAND_SECONDS.timed
     async def activate_ready_tasks(self) -> None:
-        async with self._uow_factory() as uow:
-            tasks = await uow.task_repository.list_inactive_with_past_activation_times()
-            await self._multiple_update_is_active(uow, tasks)
+        """
+        Activate every task whose activation time has passed and recompute
+        the densities of everything that they affect, in one transaction
+        """
+
+        async def _activate() -> None:
+            async with self._uow_factory() as uow:
+                activated = await uow.task_repository.activate_due_tasks(
+                    datetime.utcnow(),
+                )
+                ACTIVATION_BATCH_SIZE.observe(len(activated))
+                if not activated:
+                    return
+
+                tasks = await self._list_with_ancestors(uow, activated)
+                graph = await self._graph_executor.compute(tasks)
+                # Only the tasks whose computed values changed are written back
+                await uow.task_repository.save_many(
+                    [graph.apply(t) for t in tasks],
+                )
+                uow.push_events(
+                    [TaskActivated(t.id, prerequisites_updated=True) for t in activated]
+                )
+
+        await self._retrying(_activate)
@@ -0,0 +1,134 @@
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from whatdo2.adapters.database import new_session
+from whatdo2.adapters.orm import Association, TaskDBModel
+from whatdo2.service_layer.json_encoding import dumps
+
+# Rows fetched from the server-side cursors, and encoded, at a time
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+
+_TASK_COLUMNS = (
+    TaskDBModel.id,
+    TaskDBModel.name,
+    TaskDBModel.importance,
+    TaskDBModel.task_type,
+    TaskDBModel.time,
+    TaskDBModel.activation_time,
+    TaskDBModel.is_active,
+    TaskDBModel.density,
+    TaskDBModel.effective_density,
+)
+_EDGE_COLUMNS = (Association.parent_id, Association.child_id)
+
+
+def task_record(row: Any) -> Dict[str, Any]:
+    """
+    The record of a task, as read by the bulk import. The computed values are
+    only there for analytics, as the import computes them afresh.
+    """
+    return {"kind": "task", **row._asdict()}
+
+
+def edge_record(row: Any) -> Dict[str, Any]:
+    return {"kind": "edge", **row._asdict()}
+
+
+def encode_ndjson(
+    rows: Sequence[Any], to_record: Callable[[Any], Dict[str, Any]]
+) -> bytes:
+    return b"".join(dumps(to_record(row)) + b"\n" for row in rows)
+
+
+@asynccontextmanager
+async def _snapshot() -> AsyncGenerator[AsyncSession, None]:
+    async with new_session() as session:
+        await session.execute(
+            text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        )
+        yield session
+
+
+class TaskExportService:
+    """
+    Exports every task and dependency edge, in the format read by the bulk
+    import, or as Parquet files for analytics.
+
+    Rows are read through server-side cursors and written out a chunk at a
+    time, so an export takes the same memory whatever the number of tasks.
+    Both tables are read in one repeatable read transaction, so that the
+    edges always match the tasks.
+    """
+
+    def __init__(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> None:
+        self._chunk_size = chunk_size
+
+    async def _partitions(
+        self, session: AsyncSession, columns: Sequence[Any]
+    ) -> AsyncIterator[Sequence[Any]]:
+        result = await session.stream(
+            select(*columns).execution_options(yield_per=self._chunk_size)
+        )
+        while True:
+            rows = await result.fetchmany(self._chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    async def stream_ndjson(self) -> AsyncIterator[bytes]:
+        async with _snapshot() as session:
+            async for rows in self._partitions(session, _TASK_COLUMNS):
+                yield encode_ndjson(rows, task_record)
+            async for rows in self._partitions(session, _EDGE_COLUMNS):
+                yield encode_ndjson(rows, edge_record)
+
+    async def write_parquet(self, directory: Path) -> None:
+        """
+        Write tasks.parquet and edges.parquet to the given directory, with
+        one row group per chunk
+        """
+        # Only imported when asked for, as it is optional and slow to import
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ValueError("The parquet format needs pyarrow installed") from e
+
+        schemas = {
+            "tasks": pa.schema(
+                [
+                    ("id", pa.string()),
+                    ("name", pa.string()),
+                    ("importance", pa.int64()),
+                    ("task_type", pa.string()),
+                    ("time", pa.int64()),
+                    ("activation_time", pa.timestamp("us")),
+                    ("is_active", pa.bool_()),
+                    ("density", pa.float64()),
+                    ("effective_density", pa.float64()),
+                ]
+            ),
+            "edges": pa.schema([("parent_id", pa.string()), ("child_id", pa.string())]),
+        }
+        directory.mkdir(parents=True, exist_ok=True)
+        async with _snapshot() as session:
+            for name, columns in (("tasks", _TASK_COLUMNS), ("edges", _EDGE_COLUMNS)):
+                schema = schemas[name]
+                with pq.ParquetWriter(directory / f"{name}.parquet", schema) as writer:
+                    async for rows in self._partitions(session, columns):
+                        writer.write_batch(
+                            pa.RecordBatch.from_arrays(
+                                [
+                                    pa.array([row[i] for row in rows], type=field.type)
+                                    for i, field in enumerate(schema)
+                                ],
+                                schema=schema,
+                            )
+                        )
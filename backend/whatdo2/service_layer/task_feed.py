@@ -0,0 +1,188 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+
+from whatdo2.domain.task.events import (
+    TaskActivated,
+    TaskCreated,
+    TaskDeactivated,
+    TaskDependentsChanged,
+    TaskEvent,
+    TaskRankChanged,
+)
+from whatdo2.service_layer.json_encoding import dumps
+
+# The changes to each task, by the id of the task
+Diffs = Dict[UUID, Dict[str, Any]]
+
+FEED_EVENT_TYPES = (
+    TaskCreated,
+    TaskActivated,
+    TaskDeactivated,
+    TaskDependentsChanged,
+    TaskRankChanged,
+)
+
+
+def _diff(event: TaskEvent) -> Dict[str, Any]:
+    if isinstance(event, TaskCreated):
+        return {"created": True}
+    if isinstance(event, TaskActivated):
+        return {"is_active": True}
+    if isinstance(event, TaskDeactivated):
+        return {"is_active": False}
+    if isinstance(event, TaskDependentsChanged):
+        return {"dependents_changed": True}
+    if isinstance(event, TaskRankChanged):
+        return {
+            "task_type": event.task_type,
+            "is_active": event.is_active,
+            "effective_density": event.effective_density,
+        }
+    return {}
+
+
+def _merge(into: Diffs, diffs: Diffs) -> None:
+    for task_id, diff in diffs.items():
+        into.setdefault(task_id, {}).update(diff)
+
+
+def _message(event: str, event_id: str, data: Any) -> bytes:
+    return b"event: %s\nid: %s\ndata: %s\n\n" % (
+        event.encode(),
+        event_id.encode(),
+        dumps(data),
+    )
+
+
+class _Subscriber:
+    def __init__(self, epoch: str, max_pending: int) -> None:
+        self._epoch = epoch
+        self._max_pending = max_pending
+        self._pending: Diffs = {}
+        self._reset = False
+        self._seq = 0
+        self.wakeup = asyncio.Event()
+
+    def push(self, seq: int, diffs: Diffs) -> None:
+        self._seq = seq
+        if not self._reset:
+            _merge(self._pending, diffs)
+            if len(self._pending) > self._max_pending:
+                self.reset(seq)
+        self.wakeup.set()
+
+    def reset(self, seq: int) -> None:
+        """
+        Drop the pending changes, and have the client fetch the task list
+        again instead
+        """
+        self._seq = seq
+        self._pending = {}
+        self._reset = True
+        self.wakeup.set()
+
+    def _event_id(self) -> str:
+        return f"{self._epoch}-{self._seq}"
+
+    def take(self) -> bytes:
+        self.wakeup.clear()
+        if self._reset:
+            self._reset = False
+            return _message("reset", self._event_id(), {})
+        pending, self._pending = self._pending, {}
+        return _message(
+            "diff",
+            self._event_id(),
+            [{"id": task_id, **diff} for task_id, diff in pending.items()],
+        )
+
+
+class TaskFeed:
+    """
+    Pushes the changes to the tasks to subscribed clients, as server-sent
+    events, so that they can keep a task list current after fetching it once.
+
+    Changes come from the domain events of committed units of work. Each
+    client has its changes merged per task until it takes them, at most
+    every coalesce_delay seconds, so rapid changes to a task are sent once.
+    A client that falls more than max_pending tasks behind is sent a reset,
+    telling it to fetch the task list again, rather than held in memory.
+
+    Every message has the number of the last dispatch it includes as its
+    id, after a random epoch drawn when the feed is created. A client
+    reconnecting with that id as its Last-Event-ID is sent the changes
+    since, if they are among the last history dispatches, or a reset
+    otherwise. Ids of another process, or of one since restarted, have
+    another epoch, and always get a reset. Events are only seen by the
+    process that ran the command, so clients of one worker miss the changes
+    made through the others.
+    """
+
+    def __init__(
+        self,
+        max_pending: int,
+        history: int,
+        coalesce_delay: float,
+        keepalive: float,
+    ) -> None:
+        # Tells the ids of this feed apart from those of other processes
+        self.epoch = uuid4().hex
+        self._max_pending = max_pending
+        self._coalesce_delay = coalesce_delay
+        self._keepalive = keepalive
+        self._seq = 0
+        self._history: Deque[Tuple[int, Diffs]] = deque(maxlen=history)
+        self._subscribers: Set[_Subscriber] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    async def handle_events(self, events: Sequence[TaskEvent]) -> None:
+        diffs: Diffs = {}
+        for event in events:
+            _merge(diffs, {event.task_id: _diff(event)})
+        if not diffs:
+            return
+        self._seq += 1
+        self._history.append((self._seq, diffs))
+        for subscriber in self._subscribers:
+            subscriber.push(self._seq, diffs)
+
+    def _resume(self, subscriber: _Subscriber, last_event_id: Optional[str]) -> None:
+        if last_event_id is None:
+            return
+        epoch, _, seq_text = last_event_id.rpartition("-")
+        try:
+            seq = int(seq_text) if epoch == self.epoch else -1
+        except ValueError:
+            seq = -1
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if not oldest - 1 <= seq <= self._seq:
+            subscriber.reset(self._seq)
+            return
+        for dispatch_seq, diffs in self._history:
+            if dispatch_seq > seq:
+                subscriber.push(dispatch_seq, diffs)
+
+    async def stream(
+        self, last_event_id: Optional[str] = None
+    ) -> AsyncGenerator[bytes, None]:
+        subscriber = _Subscriber(self.epoch, self._max_pending)
+        self._resume(subscriber, last_event_id)
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        subscriber.wakeup.wait(), timeout=self._keepalive
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield b": keep-alive\n\n"
+                    continue
+                await asyncio.sleep(self._coalesce_delay)
+                yield subscriber.take()
+        finally:
+            self._subscribers.discard(subscriber)
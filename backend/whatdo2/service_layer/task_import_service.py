@@ -0,0 +1,191 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from uuid import UUID
+
+from whatdo2.domain.task.core import DependentTask, Task, TaskCircularDependencyError
+from whatdo2.domain.task.events import TaskActivationScheduled, TaskCreated
+from whatdo2.domain.task.graph import CompactGraph, ComputedGraph
+from whatdo2.service_layer.graph_executor import GraphExecutor
+from whatdo2.service_layer.task_records import (
+    InvalidRecordError,
+    TaskRecord,
+    parse_record,
+)
+from whatdo2.service_layer.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidImportError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ImportReport:
+    tasks: int
+    edges: int
+    seconds: float
+    rows_per_second: float
+
+
+class TaskImportService:
+    """
+    Imports batches of new tasks, along with the dependencies between them.
+
+    A batch is validated as a whole, its graph is checked for cycles and has
+    every density computed in one pass, and it is written in a single unit
+    of work, with multi-row inserts. Edges may only refer to tasks of the
+    same batch, and tasks that exist already are rejected.
+    """
+
+    def __init__(
+        self,
+        uow_factory: Callable[[], AsyncContextManager[UnitOfWork]],
+        graph_executor: Optional[GraphExecutor] = None,
+    ) -> None:
+        self._uow_factory = uow_factory
+        self._graph_executor = graph_executor or GraphExecutor()
+
+    async def import_tasks(self, lines: AsyncIterable[bytes]) -> ImportReport:
+        """
+        Import the task and edge records of the given JSON lines
+        """
+        started = time.perf_counter()
+        records, edges = await self._read(lines)
+
+        now = datetime.utcnow()
+        index = {task_id: i for i, task_id in enumerate(records)}
+        is_active = [
+            r.activation_time.replace(tzinfo=None) <= now for r in records.values()
+        ]
+        compact = CompactGraph(
+            ids=tuple(records),
+            importance=tuple(r.importance for r in records.values()),
+            time=tuple(r.time for r in records.values()),
+            is_active=tuple(is_active),
+            edges=tuple((index[p], index[c]) for p, c in edges),
+            pinned=(),
+        )
+        try:
+            graph = await self._graph_executor.compute_compact(compact)
+        except TaskCircularDependencyError as e:
+            raise InvalidImportError(
+                f"The tasks have a circular dependency: {e}"
+            ) from e
+
+        tasks = _build_tasks(records, edges, graph)
+        async with self._uow_factory() as uow:
+            # Saving upserts, so tasks that exist already would be overwritten
+            existing = await uow.task_repository.list_existing_ids(records)
+            if existing:
+                raise InvalidImportError(
+                    "These tasks exist already: " + ", ".join(map(str, existing))
+                )
+            await uow.task_repository.save_many(tasks)
+            uow.push_events([TaskCreated(t.id) for t in tasks])
+            uow.push_events(
+                [
+                    TaskActivationScheduled(t.id, t.activation_time)
+                    for t in tasks
+                    if not t.is_active
+                ]
+            )
+
+        seconds = time.perf_counter() - started
+        report = ImportReport(
+            tasks=len(tasks),
+            edges=len(edges),
+            seconds=seconds,
+            rows_per_second=(len(tasks) + len(edges)) / seconds,
+        )
+        logger.info(
+            "Imported %d tasks and %d edges in %.3f s (%.0f rows/s)",
+            report.tasks,
+            report.edges,
+            report.seconds,
+            report.rows_per_second,
+        )
+        return report
+
+    async def _read(
+        self, lines: AsyncIterable[bytes]
+    ) -> Tuple[Dict[UUID, TaskRecord], List[Tuple[UUID, UUID]]]:
+        records: Dict[UUID, TaskRecord] = {}
+        # Dicts rather than sets, so that dependents keep the order they were
+        # listed in
+        edges: Dict[Tuple[UUID, UUID], None] = {}
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = parse_record(line)
+            except InvalidRecordError as e:
+                raise InvalidImportError(f"Line {line_number}: {e}") from e
+
+            if isinstance(record, TaskRecord):
+                if record.id in records:
+                    raise InvalidImportError(
+                        f"Line {line_number}: task {record.id} is listed twice"
+                    )
+                records[record.id] = record
+            else:
+                edges[(record.parent_id, record.child_id)] = None
+
+        for parent_id, child_id in edges:
+            missing = [t for t in (parent_id, child_id) if t not in records]
+            if missing:
+                raise InvalidImportError(
+                    f"The edge from {parent_id} to {child_id} refers to tasks "
+                    f"that are not imported: {', '.join(map(str, missing))}"
+                )
+        return records, list(edges)
+
+
+def _build_tasks(
+    records: Dict[UUID, TaskRecord],
+    edges: List[Tuple[UUID, UUID]],
+    graph: ComputedGraph,
+) -> List[Task]:
+    """
+    Build the tasks with their computed values. Both the records and the
+    values are valid already, so nothing is validated again.
+    """
+    values: Dict[UUID, Dict[str, Any]] = {
+        task_id: {
+            "id": task_id,
+            "name": r.name,
+            "importance": r.importance,
+            "task_type": r.task_type,
+            "time": r.time,
+            "activation_time": r.activation_time,
+            "is_active": graph.is_active(task_id),
+            "density": float(r.importance / r.time),
+            "effective_density": graph.effective_density(task_id),
+            "ultimately_blocks": graph.ultimately_blocks(task_id),
+        }
+        for task_id, r in records.items()
+    }
+    snapshots: Dict[UUID, DependentTask] = {}
+    dependents: Dict[UUID, List[DependentTask]] = {t: [] for t in records}
+    for parent_id, child_id in edges:
+        if child_id not in snapshots:
+            snapshots[child_id] = DependentTask._construct(**values[child_id])
+        dependents[parent_id].append(snapshots[child_id])
+    return [
+        Task._construct(**v, is_prerequisite_for=tuple(dependents[task_id]))
+        for task_id, v in values.items()
+    ]
@@ -0,0 +1,77 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional, Sequence
+
+from whatdo2.domain.typedefs import DomainEvent
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    etag: str
+    body: bytes
+    version: int
+    cached_at: float
+
+
+class TaskListCache:
+    """
+    An in-process cache of encoded task list responses.
+
+    Every committed change to the tasks dispatches at least one domain event,
+    and any event bumps the cache version and drops the cached responses.
+    Events are only seen by the process that ran the command, so entries also
+    expire after ttl seconds to bound staleness across workers.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._version = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._entries.clear()
+
+    async def handle_events(self, events: Sequence[DomainEvent]) -> None:
+        self.invalidate()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.cached_at > self._ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def get_or_load(
+        self, key: Hashable, load: Callable[[], Awaitable[bytes]]
+    ) -> CachedResponse:
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        version = self._version
+        body = await load()
+        entry = CachedResponse(
+            # Derived from the content, so that a client holding a response
+            # from before an unrelated change still gets a 304
+            etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+            body=body,
+            version=version,
+            cached_at=time.monotonic(),
+        )
+        # Anything loaded while an invalidation happened may be stale already
+        if version == self._version:
+            self._entries[key] = entry
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -1,16 +1,23 @@
+import base64
+import json
 from datetime import datetime
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
 from pydantic import BaseModel
-from sqlalchemy.ext.asyncio.engine import create_async_engine
-from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, not_, or_
+from sqlalchemy.dialects.postgresql import array_agg
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
 
-from whatdo2.adapters.orm import TaskDBModel
-from whatdo2.config import POSTGRES_URI
+from whatdo2.adapters.database import new_session
+from whatdo2.adapters.orm import Association, TaskDBModel
 from whatdo2.domain.task.core import TaskType
+from whatdo2.service_layer.json_encoding import dumps
+
+# Tasks encoded per chunk of a streamed task list
+TASK_LIST_CHUNK_SIZE = 200
 
 
 class DependentTaskDTO(BaseModel):
@@ -36,16 +43,288 @@ class TaskDTO(BaseModel):
         orm_mode = True
 
 
+class TaskPage(BaseModel):
+    tasks: List[TaskDTO]
+    next_cursor: Optional[str]
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+def encode_cursor(effective_density: float, task_id: UUID) -> str:
+    raw = json.dumps([effective_density, str(task_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, UUID]:
+    try:
+        effective_density, task_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if not isinstance(task_id, str):
+            raise TypeError(f"Task id is not a string: {task_id!r}")
+        return float(effective_density), UUID(task_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from e
+
+
+# The columns of a TaskDTO, in the same order
+_TASK_COLUMNS = (
+    TaskDBModel.id,
+    TaskDBModel.name,
+    TaskDBModel.importance,
+    TaskDBModel.task_type,
+    TaskDBModel.time,
+    TaskDBModel.activation_time,
+    TaskDBModel.is_active,
+    TaskDBModel.density,
+    TaskDBModel.effective_density,
+)
+
+
+def _filter_task_list(
+    query: Select,
+    limit: int,
+    cursor: Optional[str],
+    task_type: Optional[TaskType],
+    is_active: Optional[bool],
+    min_effective_density: Optional[float],
+) -> Select:
+    """
+    Order, filter and limit a task list query, fetching one row more than
+    the limit to tell whether there is a next page
+    """
+    query = query.order_by(TaskDBModel.effective_density.desc(), TaskDBModel.id).limit(
+        limit + 1
+    )
+    if task_type is not None:
+        query = query.filter(TaskDBModel.task_type == task_type.value)
+    if is_active is not None:
+        query = query.filter(TaskDBModel.is_active.is_(is_active))
+    if min_effective_density is not None:
+        query = query.filter(
+            TaskDBModel.effective_density >= min_effective_density,
+        )
+    if cursor is not None:
+        after_density, after_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                TaskDBModel.effective_density < after_density,
+                and_(
+                    TaskDBModel.effective_density == after_density,
+                    TaskDBModel.id > str(after_id),
+                ),
+            )
+        )
+    return query
+
+
+def _task_json(row: Any, dependent_ids: Sequence[str]) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "importance": row.importance,
+        "task_type": row.task_type,
+        "time": row.time,
+        "activation_time": row.activation_time,
+        "is_active": row.is_active,
+        "density": row.density,
+        "effective_density": row.effective_density,
+        "is_prerequisite_for": [{"id": d} for d in dependent_ids],
+    }
+
+
+def _task_dto(row: Any, dependent_ids: Sequence[str]) -> TaskDTO:
+    """
+    Build a TaskDTO from a row of task columns, skipping validation as the
+    row comes from our own database
+    """
+    return TaskDTO.construct(
+        id=UUID(row.id),
+        name=row.name,
+        importance=row.importance,
+        task_type=TaskType(row.task_type),
+        time=row.time,
+        activation_time=row.activation_time,
+        is_active=row.is_active,
+        density=row.density,
+        effective_density=row.effective_density,
+        is_prerequisite_for=[
+            DependentTaskDTO.construct(id=UUID(d)) for d in dependent_ids
+        ],
+    )
+
+
+async def _list_dependent_ids(
+    session: AsyncSession, task_ids: Sequence[str]
+) -> Dict[str, List[str]]:
+    """
+    Ids of the dependents of each of the given tasks, aggregated per task by
+    the database
+    """
+    if not task_ids:
+        return {}
+    results = await session.execute(
+        select(Association.parent_id, array_agg(Association.child_id))
+        .filter(Association.parent_id.in_(task_ids))
+        .group_by(Association.parent_id)
+    )
+    return {parent_id: child_ids for parent_id, child_ids in results.all()}
+
+
 class TaskQueryService:
-    def __init__(self) -> None:
-        self._engine = create_async_engine(POSTGRES_URI, echo=False)
+    async def list_tasks(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        task_type: Optional[TaskType] = None,
+        is_active: Optional[bool] = None,
+        min_effective_density: Optional[float] = None,
+    ) -> TaskPage:
+        """
+        Return a page of tasks, densest first, starting after the given cursor
+        (keyset pagination on effective_density DESC, id)
+        """
+        query = _filter_task_list(
+            select(*_TASK_COLUMNS),
+            limit=limit,
+            cursor=cursor,
+            task_type=task_type,
+            is_active=is_active,
+            min_effective_density=min_effective_density,
+        )
+
+        async with new_session() as session:
+            rows = (await session.execute(query)).all()
+            page = rows[:limit]
+            dependent_ids = await _list_dependent_ids(session, [row.id for row in page])
+        tasks = [_task_dto(row, dependent_ids.get(row.id, ())) for row in page]
+
+        next_cursor = (
+            encode_cursor(tasks[-1].effective_density, tasks[-1].id)
+            if len(rows) > limit
+            else None
+        )
+        return TaskPage(tasks=tasks, next_cursor=next_cursor)
+
+    def stream_tasks_json(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        task_type: Optional[TaskType] = None,
+        is_active: Optional[bool] = None,
+        min_effective_density: Optional[float] = None,
+        chunk_size: int = TASK_LIST_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """
+        Return the same page of tasks as list_tasks, as the chunks of its
+        JSON encoding. The rows come from our own database, so they are
+        encoded straight from the selected columns, without validation.
+
+        An invalid cursor is rejected right away, rather than once the
+        chunks are iterated over.
+        """
+        query = _filter_task_list(
+            select(*_TASK_COLUMNS),
+            limit=limit,
+            cursor=cursor,
+            task_type=task_type,
+            is_active=is_active,
+            min_effective_density=min_effective_density,
+        )
+        return self._stream_tasks_json(query, limit, chunk_size)
+
+    async def _stream_tasks_json(
+        self, query: Select, limit: int, chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        yield b'{"tasks":['
+        sent = 0
+        last: Any = None
+        has_more = False
+        async with new_session() as session:
+            # Read through a server-side cursor, a chunk at a time, so that
+            # only one chunk of rows is held in memory
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            while not has_more:
+                chunk = await result.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                # The query selects one row past the page, to tell whether
+                # there is a next one
+                if sent + len(chunk) > limit:
+                    has_more = True
+                    chunk = chunk[: limit - sent]
+                    if not chunk:
+                        break
+                dependent_ids = await _list_dependent_ids(
+                    session, [row.id for row in chunk]
+                )
+                encoded = dumps(
+                    [_task_json(row, dependent_ids.get(row.id, ())) for row in chunk]
+                )
+                # Drop the brackets, as the chunks are parts of one list
+                yield (b"," if sent else b"") + encoded[1:-1]
+                sent += len(chunk)
+                last = chunk[-1]
+
+        next_cursor = (
+            encode_cursor(last.effective_density, UUID(last.id)) if has_more else None
+        )
+        yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
+
+    async def list_next_tasks(
+        self, n: int, task_type: Optional[TaskType] = None
+    ) -> List[TaskDTO]:
+        """
+        Return the n densest active tasks, of the given type if any, through
+        the partial index over the active tasks
+        """
+        page = await self.list_tasks(limit=n, task_type=task_type, is_active=True)
+        return page.tasks
+
+    async def get_tasks(self, task_ids: Sequence[UUID]) -> List[TaskDTO]:
+        """
+        Return the given tasks, in the given order, skipping any that no
+        longer exist
+        """
+        ids = [str(t) for t in task_ids]
+        async with new_session() as session:
+            results = await session.execute(
+                select(*_TASK_COLUMNS).filter(TaskDBModel.id.in_(ids))
+            )
+            rows = {row.id: row for row in results.all()}
+            dependent_ids = await _list_dependent_ids(session, list(rows))
+        return [
+            _task_dto(rows[task_id], dependent_ids.get(task_id, ()))
+            for task_id in ids
+            if task_id in rows
+        ]
+
+    async def list_task_ranks(self) -> List[Tuple[UUID, str, float]]:
+        """
+        Return the id, type and effective density of every active task
+        """
+        async with new_session() as session:
+            many_results = await session.execute(
+                select(
+                    TaskDBModel.id, TaskDBModel.task_type, TaskDBModel.effective_density
+                ).filter(TaskDBModel.is_active.is_(True))
+            )
+            return [
+                (UUID(task_id), task_type, effective_density)
+                for task_id, task_type, effective_density in many_results.all()
+            ]
 
-    async def list_tasks(self) -> List[TaskDTO]:
-        async with AsyncSession(self._engine, expire_on_commit=False) as session:
+    async def list_scheduled_activations(self) -> List[Tuple[UUID, datetime]]:
+        """
+        Return the id and activation time of every inactive task
+        """
+        async with new_session() as session:
             many_results = await session.execute(
-                select(TaskDBModel)
-                .order_by(TaskDBModel.effective_density.desc())
-                .options(selectinload(TaskDBModel.is_prerequisite_for))
+                select(TaskDBModel.id, TaskDBModel.activation_time).filter(
+                    not_(TaskDBModel.is_active)
+                )
             )
-            db_tasks = many_results.scalars().all()
-            return [TaskDTO.from_orm(t) for t in db_tasks]
+            return [
+                (UUID(task_id), activation_time)
+                for task_id, activation_time in many_results.all()
+            ]
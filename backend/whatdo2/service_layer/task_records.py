@@ -0,0 +1,80 @@
+"""
+The records of the task interchange format, shared by the bulk import and
+export of tasks: JSON lines, each holding either a task, or an edge from a
+task to a task that it is a prerequisite for
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Literal, Union
+from uuid import UUID
+
+from pydantic import BaseModel, PositiveInt, ValidationError
+
+from whatdo2.domain.task.core import TaskType
+
+
+class TaskRecord(BaseModel):
+    kind: Literal["task"] = "task"
+    id: UUID
+    name: str
+    importance: int
+    task_type: TaskType
+    time: PositiveInt
+    activation_time: datetime
+
+
+class EdgeRecord(BaseModel):
+    kind: Literal["edge"] = "edge"
+    # The prerequisite, and the task that depends on it
+    parent_id: UUID
+    child_id: UUID
+
+
+Record = Union[TaskRecord, EdgeRecord]
+
+
+class InvalidRecordError(Exception):
+    pass
+
+
+def parse_record(line: bytes) -> Record:
+    try:
+        value = json.loads(line)
+    except ValueError as e:
+        raise InvalidRecordError(f"Not valid JSON: {e}") from e
+    if not isinstance(value, dict):
+        raise InvalidRecordError("Not a JSON object")
+
+    kind = value.get("kind")
+    if kind == "edge":
+        # Edges make up most of a graph, and are simple enough to check
+        # without going through pydantic
+        try:
+            return EdgeRecord.construct(
+                parent_id=UUID(value["parent_id"]),
+                child_id=UUID(value["child_id"]),
+            )
+        except KeyError as e:
+            raise InvalidRecordError(f"Edge without a {e.args[0]}") from e
+        except (AttributeError, TypeError, ValueError) as e:
+            raise InvalidRecordError(f"Edge with an invalid id: {e}") from e
+    if kind == "task":
+        try:
+            return TaskRecord.parse_obj(value)
+        except ValidationError as e:
+            raise InvalidRecordError(str(e)) from e
+    raise InvalidRecordError(f"Unknown kind of record {kind!r}")
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a stream of bytes into lines, whatever the sizes of its chunks
+    """
+    rest = b""
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
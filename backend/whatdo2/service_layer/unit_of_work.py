@@ -1,20 +1,38 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Iterable, List
 
-from sqlalchemy.ext.asyncio.engine import create_async_engine
-from sqlalchemy.ext.asyncio.session import AsyncSession
-
+from whatdo2.adapters.database import new_session
+from whatdo2.adapters.in_memory_task_repository import (
+    InMemoryTaskRepository,
+    InMemoryTaskStore,
+)
 from whatdo2.adapters.sql_task_repository import SQLTaskRepository
-from whatdo2.config import POSTGRES_URI
+from whatdo2.adapters.task_repository import TaskRepository
+from whatdo2.domain.task.events import TaskRankChanged
 from whatdo2.domain.typedefs import DomainEvent
 from whatdo2.service_layer.eventbus import EventBus
+from whatdo2.service_layer.identity_map import IdentityMapTaskRepository
 
 
 class UnitOfWork:
-    def __init__(self, session: AsyncSession):
-        self.task_repository = SQLTaskRepository(session)
+    def __init__(self, task_repository: TaskRepository):
+        # Repeated gets within the unit of work are served from its identity
+        # map, and its writes are held back until it is flushed
+        self.task_repository = IdentityMapTaskRepository(task_repository)
         self._events: List[DomainEvent] = []
 
+    async def flush(self) -> None:
+        await self.task_repository.flush()
+        self.push_events(
+            TaskRankChanged(
+                task_id=task.id,
+                task_type=task.task_type.value,
+                is_active=task.is_active,
+                effective_density=task.effective_density or 0.0,
+            )
+            for task in self.task_repository.pop_ranked()
+        )
+
     def push_events(self, events: Iterable[DomainEvent]) -> None:
         self._events.extend(events)
 
@@ -25,12 +43,35 @@ class UnitOfWork:
 
 @asynccontextmanager
 async def new_uow(eventbus: EventBus) -> AsyncGenerator[UnitOfWork, None]:
-    engine = create_async_engine(POSTGRES_URI, echo=False)
-
-    async with AsyncSession(engine, expire_on_commit=False) as session:
-        uow = UnitOfWork(session)
+    async with new_session() as session:
+        uow = UnitOfWork(SQLTaskRepository(session))
         yield uow
+        await uow.flush()
+        # Repositories never commit, so that everything written within the
+        # unit of work lands in this single transaction
         await session.commit()
 
     # Publish events after transaction is over
     await eventbus.dispatch(uow.pushed_events)
+
+
+@asynccontextmanager
+async def new_in_memory_uow(
+    eventbus: EventBus, store: InMemoryTaskStore
+) -> AsyncGenerator[UnitOfWork, None]:
+    """
+    A drop-in replacement for new_uow, backed by an in-memory store instead
+    of the database
+    """
+    task_repository = InMemoryTaskRepository(store)
+    uow = UnitOfWork(task_repository)
+    try:
+        yield uow
+    except BaseException:
+        task_repository.rollback()
+        raise
+    await uow.flush()
+    task_repository.commit()
+
+    # Publish events after transaction is over
+    await eventbus.dispatch(uow.pushed_events)